@@ -1,7 +1,8 @@
 # App
 from __init__ import create_app
 
-app = create_app()
-
 if __name__ == '__main__':
+    # Created under the guard so that spawned worker processes (e.g. the password
+    # hashing pool) can import this module without starting another app.
+    app = create_app()
     app.run(port = 5000, host='0.0.0.0')
\ No newline at end of file
@@ -1,9 +1,102 @@
+# Python
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+# App
 from __init__ import bcrypt
+from constants import (
+    BCRYPT_LOG_ROUNDS,
+    BCRYPT_POOL_QUEUE_SIZE,
+    BCRYPT_POOL_TIMEOUT,
+    BCRYPT_POOL_WORKERS
+)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool has no capacity left for a new job."""
+
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _generate_password_hash(password, rounds):
+    return bcrypt.generate_password_hash(password, rounds).decode('utf-8')
+
+
+def _check_password_hash(pw_hash, password):
+    return bcrypt.check_password_hash(pw_hash, password)
+
+
+def _discard_pool(pool):
+    # A worker of the pool died (e.g. killed by the OOM killer) and the executor
+    # now rejects every job: the next call creates a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_in_pool(fn, *args):
+    """
+    Runs a bcrypt call in the process pool, so that CPU bound hashing doesn't hold
+    the GIL of the worker serving requests.
+
+    At most BCRYPT_POOL_WORKERS jobs run at a time and BCRYPT_POOL_QUEUE_SIZE more
+    may wait; beyond that the call is rejected instead of queueing without bound.
+    The pool is created lazily, and again after a fork, so that every gunicorn
+    worker owns its own pool, or after one of its processes died.
+
+    Args:
+        fn: The function to run in the pool.
+        *args: The arguments of the function.
+
+    Returns:
+        The return value of the function.
+
+    Raises:
+        PasswordHashingBusy: If the pool is saturated or broken, or the job times out.
+    """
+    global _pool, _pool_pid, _pool_slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=BCRYPT_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+            _pool_slots = threading.BoundedSemaphore(BCRYPT_POOL_WORKERS + BCRYPT_POOL_QUEUE_SIZE)
+        pool, slots = _pool, _pool_slots
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy("Too many authentication requests, please retry later")
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException as error:
+        # The slot is only released by the job once submitted
+        slots.release()
+        if isinstance(error, BrokenProcessPool):
+            _discard_pool(pool)
+            raise PasswordHashingBusy("Password hashing is restarting, please retry later")
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=BCRYPT_POOL_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHashingBusy("Too many authentication requests, please retry later")
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise PasswordHashingBusy("Password hashing is restarting, please retry later")
 
 
 def hash_password(password):
     """
-    Hashes a plain text password using bcrypt.
+    Hashes a plain text password using bcrypt with BCRYPT_LOG_ROUNDS rounds.
     
     Args:
         password (str): The plain text password to hash.
@@ -11,7 +104,7 @@ def hash_password(password):
     Returns:
         str: The hashed password, decoded from bytes to a UTF-8 string.
     """
-    return bcrypt.generate_password_hash(password).decode('utf-8')
+    return _run_in_pool(_generate_password_hash, password, BCRYPT_LOG_ROUNDS)
 
 
 def check_valid_password(db_user_password, data_password):
@@ -25,4 +118,20 @@ def check_valid_password(db_user_password, data_password):
     Returns:
         bool: True if the passwords match, False otherwise.
     """
-    return bcrypt.check_password_hash(db_user_password, data_password)
\ No newline at end of file
+    return _run_in_pool(_check_password_hash, db_user_password, data_password)
+
+
+def password_needs_rehash(db_user_password):
+    """
+    Checks if a stored hash was generated with a cost other than BCRYPT_LOG_ROUNDS.
+    
+    Args:
+        db_user_password (str): The hashed password stored in the database, e.g. '$2b$12$...'.
+
+    Returns:
+        bool: True if the password should be hashed again, False otherwise.
+    """
+    try:
+        return int(db_user_password.split('$')[2]) != BCRYPT_LOG_ROUNDS
+    except (IndexError, ValueError):
+        return True
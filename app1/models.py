@@ -25,7 +25,12 @@ class User(db.Model):
 
 class Log(db.Model):
     __tablename__ = 'Log'
-    __table_args__ = {'schema': 'Security'}
+    # Partitioned by month on PostgreSQL, see partitions.py
+    __table_args__ = {
+        'schema': 'Security',
+        'postgresql_partition_by': 'RANGE (timestamp)',
+        'info': {'partition_key': 'timestamp'}
+    }
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Security.User.id'), nullable=False)
     user = db.relationship("User", back_populates="logs")
@@ -0,0 +1,115 @@
+# Flask
+from flask import request
+from flask_restx import abort
+# Python
+import base64
+import json
+from urllib.parse import urlencode
+# App
+from constants import (
+    PAGE_SIZE_DEFAULT,
+    PAGE_SIZE_MAX
+)
+
+
+pagination_params = {
+    'cursor': 'Opaque cursor returned in the Link header of the previous page',
+    'limit': f'Page size (default {PAGE_SIZE_DEFAULT}, maximum {PAGE_SIZE_MAX})'
+}
+
+
+def encode_cursor(value):
+    """
+    Encodes a key value into an opaque, URL-safe cursor.
+
+    Args:
+        value (int): The key value of the last row in the page.
+
+    Returns:
+        str: The encoded cursor.
+    """
+    raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor, aborting with 400 if it is malformed
+    or doesn't hold an integer key.
+
+    Args:
+        cursor (str): The opaque cursor sent by the client, or None.
+
+    Returns:
+        int: The decoded key value, or None when no cursor was sent.
+    """
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError):
+        abort(400, "Invalid cursor")
+    # Keys are integers; bool is a subclass of int, but not a key
+    if type(value) is not int:
+        abort(400, "Invalid cursor")
+    return value
+
+
+def page_size():
+    """
+    Reads the requested page size from the query string, clamped to PAGE_SIZE_MAX.
+
+    Returns:
+        int: The number of rows to return in the page.
+    """
+    limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+    if limit < 1:
+        abort(400, "limit must be a positive integer")
+    return min(limit, PAGE_SIZE_MAX)
+
+
+def next_link(cursor, limit):
+    """
+    Builds the URL of the next page, preserving the current query string.
+
+    Args:
+        cursor (str): The cursor of the next page.
+        limit (int): The page size in use.
+
+    Returns:
+        str: The absolute URL of the next page.
+    """
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    args['limit'] = limit
+    return f'{request.base_url}?{urlencode(args)}'
+
+
+def paginate(query, key):
+    """
+    Returns one page of a query using keyset pagination on a unique key column.
+
+    Rows are filtered with ``key > last_key`` instead of an OFFSET, so every page
+    is an index range scan that costs the same regardless of its position.
+
+    Args:
+        query: The SQLAlchemy query to paginate, without ORDER BY or LIMIT.
+        key: The unique, indexed column to paginate on (usually the primary key).
+
+    Returns:
+        tuple: The rows of the page, status code 200 and the response headers,
+        including a ``Link`` header with ``rel="next"`` when more rows exist.
+    """
+    limit = page_size()
+    after = decode_cursor(request.args.get('cursor'))
+    if after is not None:
+        query = query.filter(key > after)
+    rows = query.order_by(key).limit(limit + 1).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = encode_cursor(getattr(rows[-1], key.key))
+        headers['Link'] = f'<{next_link(cursor, limit)}>; rel="next"'
+        headers['X-Next-Cursor'] = cursor
+    return rows, 200, headers
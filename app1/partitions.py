@@ -0,0 +1,454 @@
+# Flask
+from flask import request
+from flask_restx import abort
+# SQLAlchemy
+from sqlalchemy import PrimaryKeyConstraint, text
+from sqlalchemy.ext.compiler import compiles
+# Python
+import logging
+import operator
+import os
+import re
+import subprocess
+from datetime import datetime
+# App
+from __init__ import db
+from constants import (
+    PARTITION_ARCHIVE_DIR,
+    PARTITION_MONTHS_AHEAD,
+    PARTITION_RETENTION_MONTHS
+)
+
+
+logger = logging.getLogger(__name__)
+
+# How long DDL on a partitioned table waits for the queries holding it before giving up
+LOCK_TIMEOUT = '5s'
+
+BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+time_range_params = {
+    'since': 'Only rows at or after this ISO 8601 date or datetime',
+    'until': 'Only rows before this ISO 8601 date or datetime'
+}
+
+
+@compiles(PrimaryKeyConstraint, 'postgresql')
+def _compile_primary_key(constraint, compiler, **kw):
+    # The unique constraints of a partitioned table must include the partition key
+    key = constraint.table.info.get('partition_key')
+    if key is None or key in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = [column.name for column in constraint.columns] + [key]
+    return f"PRIMARY KEY ({', '.join(compiler.preparer.quote(column) for column in columns)})"
+
+
+def filter_time_range(query, column):
+    """
+    Applies the ``since`` and ``until`` query parameters to a query, aborting with
+    400 if they are not ISO 8601 dates.
+
+    On a partitioned table, filtering on the partition key lets PostgreSQL skip the
+    partitions outside the range.
+
+    Args:
+        query: The SQLAlchemy query or select to filter.
+        column: The datetime column to filter on.
+
+    Returns:
+        The filtered query.
+    """
+    for name, compare in (('since', operator.ge), ('until', operator.lt)):
+        value = request.args.get(name)
+        if not value:
+            continue
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            abort(400, f"{name} must be an ISO 8601 date or datetime")
+        if moment.tzinfo is not None:
+            # Dates are stored as naive local times
+            moment = moment.astimezone().replace(tzinfo=None)
+        query = query.filter(compare(column, moment))
+    return query
+
+
+def partitioned_tables():
+    """
+    Returns:
+        list: The tables of the app partitioned by month, i.e. those declaring a
+        ``partition_key`` in their info.
+    """
+    return [table for table in db.metadata.sorted_tables if table.info.get('partition_key')]
+
+
+def is_postgresql():
+    """
+    Returns:
+        bool: Whether the database supports partitioning.
+    """
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _month(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _quote(name):
+    return db.engine.dialect.identifier_preparer.quote_identifier(name)
+
+
+def _qualified(table, name=None):
+    name = _quote(name or table.name)
+    if table.schema:
+        return f'{db.engine.dialect.identifier_preparer.quote_schema(table.schema)}.{name}'
+    return name
+
+
+def partition_name(table, month):
+    """
+    Args:
+        table: The partitioned table.
+        month (datetime): The first day of the month.
+
+    Returns:
+        str: The name of the partition holding the rows of that month.
+    """
+    return f'{table.name}_p{month:%Y_%m}'
+
+
+def _default_name(table):
+    return f'{table.name}_default'
+
+
+def _bounds(lower, upper):
+    return f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+
+
+def table_kind(conn, table):
+    """
+    Args:
+        conn: A connection to the database.
+        table: The table to look up.
+
+    Returns:
+        str: 'partitioned' or 'plain', or None if the table doesn't exist.
+    """
+    kind = conn.scalar(
+        text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)'),
+        {'name': _qualified(table)}
+    )
+    if kind is None:
+        return None
+    return 'partitioned' if kind == 'p' else 'plain'
+
+
+def list_partitions(conn, table):
+    """
+    Args:
+        conn: A connection to the database.
+        table: The partitioned table.
+
+    Returns:
+        list: A (name, lower bound, upper bound) tuple per partition, in bound order,
+        with None bounds for the default partition.
+    """
+    rows = conn.execute(
+        text(
+            'SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) '
+            'FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = CAST(:name AS regclass)'
+        ),
+        {'name': _qualified(table)}
+    )
+    partitions = []
+    for name, bound in rows:
+        match = BOUNDS.search(bound)
+        if match:
+            partitions.append((name, datetime.fromisoformat(match[1]), datetime.fromisoformat(match[2])))
+        else:
+            partitions.append((name, None, None))
+    return sorted(partitions, key=lambda partition: (partition[1] is not None, partition[1]))
+
+
+def detached_partitions(conn, table):
+    """
+    Finds the monthly partitions of a table that exist as standalone tables, e.g.
+    when archive_partition was interrupted between detaching and dropping one.
+    Their rows are missing from the queries on the table until they are attached
+    back.
+
+    Args:
+        conn: A connection to the database.
+        table: The partitioned table.
+
+    Returns:
+        list: A (name, lower bound, upper bound) tuple per detached partition, in
+        bound order.
+    """
+    pattern = re.compile(re.escape(table.name) + r'_p(\d{4})_(\d{2})')
+    names = conn.scalars(
+        text(
+            'SELECT relname FROM pg_class JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace '
+            "WHERE nspname = :schema AND relkind = 'r' AND NOT relispartition"
+        ),
+        {'schema': table.schema or 'public'}
+    )
+    partitions = []
+    for name in names:
+        match = pattern.fullmatch(name)
+        if match:
+            month = datetime(int(match[1]), int(match[2]), 1)
+            partitions.append((name, month, _add_months(month, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _maintenance_timeouts(conn, lock_timeout=True):
+    # DB_STATEMENT_TIMEOUT applies to every connection, CLI commands included, but
+    # copying rows or validating a partition can take longer on a large table. DDL
+    # still gives up after LOCK_TIMEOUT if queries hold the table.
+    conn.execute(text('SET LOCAL statement_timeout = 0'))
+    if lock_timeout:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+
+
+def _create_partition(conn, table, month, attach=False):
+    # Rows of the month may already be in the default partition, e.g. when the
+    # maintenance job ran late. The partition can only be created once they are
+    # moved out of it. With attach, the partition is an existing table of that
+    # month, attached back instead of created.
+    parent = _qualified(table)
+    default = _qualified(table, _default_name(table))
+    key = _quote(table.info['partition_key'])
+    bounds = {'lower': month, 'upper': _add_months(month, 1)}
+    in_range = f'{key} >= :lower AND {key} < :upper'
+    _maintenance_timeouts(conn)
+    misplaced = conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})'), bounds)
+    if misplaced:
+        conn.execute(text(f'ALTER TABLE {parent} DETACH PARTITION {default}'))
+    child = _qualified(table, partition_name(table, month))
+    if attach:
+        conn.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {child} {_bounds(bounds['lower'], bounds['upper'])}"))
+    else:
+        conn.execute(text(f"CREATE TABLE {child} PARTITION OF {parent} {_bounds(bounds['lower'], bounds['upper'])}"))
+    if misplaced:
+        conn.execute(
+            text(f'WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) INSERT INTO {parent} SELECT * FROM moved'),
+            bounds
+        )
+        conn.execute(text(f'ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT'))
+
+
+def attach_partitions(table):
+    """
+    Attaches back the detached partitions of a table (see detached_partitions),
+    each in its own transaction. Expired ones are then archived again by the next
+    ``partitions retain``.
+
+    Args:
+        table: The partitioned table.
+
+    Returns:
+        list: The names of the partitions attached back.
+    """
+    with db.engine.connect() as conn:
+        detached = detached_partitions(conn, table)
+    for name, lower, _ in detached:
+        logger.warning("Partition %s was left detached, attaching it back", name)
+        with db.engine.begin() as conn:
+            _create_partition(conn, table, lower, attach=True)
+    return [name for name, _, _ in detached]
+
+
+def create_partitions(table, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Creates the default partition and the monthly partitions of a table from the
+    current month to ``months_ahead`` months from now, along with those of any month
+    that has rows in the default partition (moving the rows into them). Each partition is created in its own
+    transaction, so that the table is only locked briefly. Detached partitions are
+    attached back first.
+
+    Args:
+        table: The partitioned table.
+        months_ahead (int): How many months past the current one to prepare.
+
+    Returns:
+        list: The names of the partitions created.
+    """
+    attach_partitions(table)
+    default = _default_name(table)
+    with db.engine.begin() as conn:
+        _maintenance_timeouts(conn, lock_timeout=False)
+        existing = list_partitions(conn, table)
+        if not any(name == default for name, _, _ in existing):
+            conn.execute(text(f'CREATE TABLE {_qualified(table, default)} PARTITION OF {_qualified(table)} DEFAULT'))
+        key = _quote(table.info['partition_key'])
+        months = set(conn.scalars(text(
+            f'SELECT DISTINCT date_trunc(\'month\', {key}) FROM {_qualified(table, default)}'
+        )))
+    existing = {lower for _, lower, _ in existing if lower is not None}
+    month = _month(datetime.now())
+    last = _add_months(_month(datetime.now()), months_ahead)
+    while month <= last:
+        months.add(month)
+        month = _add_months(month, 1)
+    created = []
+    for month in sorted(months - existing):
+        with db.engine.begin() as conn:
+            _create_partition(conn, table, month)
+        created.append(partition_name(table, month))
+    return created
+
+
+def migrate_table(table, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Converts an existing plain table into a partitioned one in a single
+    transaction: the table is renamed, recreated as partitioned with its indexes
+    and partitions, and its rows are copied over. The table is locked for the
+    whole copy.
+
+    Args:
+        table: The table to convert.
+        months_ahead (int): How many months past the current one to prepare.
+
+    Returns:
+        int: The number of rows moved.
+
+    Raises:
+        ValueError: If some rows have no partition key.
+    """
+    parent = _qualified(table)
+    old_name = f'{table.name}_unpartitioned'
+    key = _quote(table.info['partition_key'])
+    columns = ', '.join(_quote(column.name) for column in table.columns)
+    (id_column,) = table.primary_key.columns
+    with db.engine.begin() as conn:
+        _maintenance_timeouts(conn, lock_timeout=False)
+        conn.execute(text(f'LOCK TABLE {parent} IN ACCESS EXCLUSIVE MODE'))
+        if conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM {parent} WHERE {key} IS NULL)')):
+            raise ValueError(f"{table.name} has rows without {table.info['partition_key']}")
+        first = conn.scalar(text(f'SELECT min({key}) FROM {parent}'))
+        # The new table takes the names of the old one's foreign keys, indexes and
+        # sequence
+        for (constraint,) in conn.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"),
+            {'table': parent}
+        ):
+            conn.execute(text(f'ALTER TABLE {parent} DROP CONSTRAINT {_quote(constraint)}'))
+        sequence = conn.scalar(
+            text('SELECT CAST(CAST(pg_get_serial_sequence(:table, :column) AS regclass) AS text)'),
+            {'table': parent, 'column': id_column.name}
+        )
+        for (index,) in conn.execute(
+            text('SELECT indexname FROM pg_indexes WHERE schemaname = :schema AND tablename = :table'),
+            {'schema': table.schema or 'public', 'table': table.name}
+        ):
+            conn.execute(text(f'ALTER INDEX {_qualified(table, index)} RENAME TO {_quote(index + "_unpartitioned")}'))
+        if sequence:
+            sequence_name = sequence.rsplit('.', 1)[-1].strip('"')
+            conn.execute(text(f'ALTER SEQUENCE {sequence} RENAME TO {_quote(sequence_name + "_unpartitioned")}'))
+        conn.execute(text(f'ALTER TABLE {parent} RENAME TO {_quote(old_name)}'))
+        table.create(conn)
+        conn.execute(text(f'CREATE TABLE {_qualified(table, _default_name(table))} PARTITION OF {parent} DEFAULT'))
+        month = _month(first or datetime.now())
+        last = _add_months(_month(datetime.now()), months_ahead)
+        while month <= last:
+            _create_partition(conn, table, month)
+            month = _add_months(month, 1)
+        moved = conn.execute(text(
+            f'INSERT INTO {parent} ({columns}) SELECT {columns} FROM {_qualified(table, old_name)}'
+        )).rowcount
+        conn.execute(
+            text(f'SELECT setval(pg_get_serial_sequence(:table, :column), coalesce(max({_quote(id_column.name)}), 0) + 1, false) FROM {parent}'),
+            {'table': parent, 'column': id_column.name}
+        )
+        conn.execute(text(f'DROP TABLE {_qualified(table, old_name)}'))
+    return moved
+
+
+def _pg_dump(table, name, path):
+    url = db.engine.url
+    command = ['pg_dump', '--format=custom', '--compress=9', '--table', _qualified(table, name), '--file', path]
+    # The host may also come as a query parameter, e.g. a Unix socket directory
+    host = url.host or url.query.get('host')
+    if host:
+        command += ['--host', host]
+    if url.port:
+        command += ['--port', str(url.port)]
+    if url.username:
+        command += ['--username', url.username]
+    command.append(url.database)
+    environment = dict(os.environ)
+    if url.password:
+        environment['PGPASSWORD'] = url.password
+    subprocess.run(command, env=environment, check=True, capture_output=True, text=True)
+
+
+def expired_partitions(table, retention_months=PARTITION_RETENTION_MONTHS):
+    """
+    Args:
+        table: The partitioned table.
+        retention_months (int): How many months of rows to keep, besides the
+            current one.
+
+    Returns:
+        list: A (name, lower bound, upper bound) tuple per partition whose rows are
+        all older than the retention period.
+    """
+    cutoff = _add_months(_month(datetime.now()), -retention_months)
+    with db.engine.connect() as conn:
+        return [
+            partition for partition in list_partitions(conn, table)
+            if partition[2] is not None and partition[2] <= cutoff
+        ]
+
+
+def archive_partition(table, partition, archive_dir=PARTITION_ARCHIVE_DIR):
+    """
+    Detaches a partition, dumps it to a compressed file (pg_dump custom format) in
+    the archive directory and drops it. If the dump fails, the partition is
+    attached back; a dump is only kept under its final name once complete. If the
+    process dies before the drop, the partition stays detached until the next
+    ``partitions create`` or ``partitions retain`` attaches it back (see
+    attach_partitions) and archives it again.
+
+    The archive restores as a standalone table with ``pg_restore``, which can then
+    be attached back to the partitioned table.
+
+    Args:
+        table: The partitioned table.
+        partition (tuple): The name, lower and upper bound of the partition, as
+            returned by expired_partitions.
+        archive_dir (str): The directory of the dump files.
+
+    Returns:
+        str: The path of the dump file.
+
+    Raises:
+        subprocess.CalledProcessError: If pg_dump failed.
+    """
+    name, lower, upper = partition
+    parent, child = _qualified(table), _qualified(table, name)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{table.schema or "public"}.{name}.dump')
+    temporary_path = f'{path}.tmp'
+    with db.engine.begin() as conn:
+        _maintenance_timeouts(conn)
+        conn.execute(text(f'ALTER TABLE {parent} DETACH PARTITION {child}'))
+    try:
+        _pg_dump(table, name, temporary_path)
+    except (OSError, subprocess.CalledProcessError):
+        with db.engine.begin() as conn:
+            _maintenance_timeouts(conn, lock_timeout=False)
+            conn.execute(text(f'ALTER TABLE {parent} ATTACH PARTITION {child} {_bounds(lower, upper)}'))
+        raise
+    os.replace(temporary_path, path)
+    with db.engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE {child}'))
+    logger.info("Archived partition %s to %s", name, path)
+    return path
@@ -0,0 +1,55 @@
+# SQLAlchemy
+from sqlalchemy.orm import joinedload
+# Python
+from collections import namedtuple
+# App
+from models import User
+
+
+Principal = namedtuple('Principal', ['user_id', 'username', 'role_id', 'role'])
+
+# Relationships read by build_principal, loaded with the user at login
+principal_loader = joinedload(User.role)
+
+
+def build_principal(user):
+    """
+    Resolves the principal of a user, with its role.
+
+    Args:
+        user (User): The user, ideally loaded with principal_loader.
+
+    Returns:
+        Principal: The resolved principal.
+    """
+    role = user.role
+    return Principal(
+        user_id=user.id,
+        username=user.username,
+        role_id=user.role_id,
+        role=role.name if role else None
+    )
+
+
+def principal_claims(principal):
+    """
+    Returns the claims that embed a principal in an access token, so that every
+    service can authorize requests without querying the Security schema.
+
+    Permissions are not embedded: permission_required looks the current role of the
+    uid up in role_cache and checks it against the permission matrix, so that role
+    and access control changes apply within RBAC_REFRESH_INTERVAL seconds (at once
+    in the app1 worker that makes them). The role_id and role claims only describe
+    the user at login.
+
+    Args:
+        principal (Principal): The principal of the user logging in.
+
+    Returns:
+        dict: The additional claims of the access token.
+    """
+    return {
+        'uid': principal.user_id,
+        'role_id': principal.role_id,
+        'role': principal.role
+    }
@@ -0,0 +1,198 @@
+# Flask
+from flask import current_app, request
+from flask_restx.representations import output_json
+# Python
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+# App
+from __init__ import db
+from constants import (
+    REFERENCE_CACHE_DIR,
+    REFERENCE_CACHE_TTL,
+    REFERENCE_MAX_AGE
+)
+from routing import primary
+
+
+# Snapshot header: generation, load time (epoch seconds), ETag, body length
+_SNAPSHOT_HEADER = struct.Struct('<Qd32sQ')
+_GENERATION = struct.Struct('<Q')
+
+
+def _read_body(snapshot):
+    _, _, etag, length = _SNAPSHOT_HEADER.unpack_from(snapshot)
+    return snapshot[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + length], etag.decode('ascii')
+
+
+class ReferenceData:
+    """
+    Cache of a small, rarely changing table, shared by all the workers of a host.
+
+    The serialized rows live in a snapshot file (under REFERENCE_CACHE_DIR, /dev/shm by
+    default) that every worker maps into memory, so the table is read from the database
+    once per change instead of once per worker. A generation counter, also memory-mapped,
+    is incremented by ``bump`` after a write; workers compare it with the generation of
+    their snapshot on every access, and the first one to see a mismatch reloads the table
+    under a file lock while the others wait and then map the new file. Snapshots older
+    than REFERENCE_CACHE_TTL seconds are reloaded too, to pick up changes made outside
+    the API.
+
+    The response body is served with a strong ETag (a hash of the body): a client sending
+    a matching If-None-Match gets a 304 without touching the database or the serializer.
+
+    Args:
+        name (str): Unique name of the table, used for the snapshot file names.
+        load: A function returning the serialized rows, called inside the request.
+        key (str): The field of the serialized rows used by ``get``.
+    """
+    def __init__(self, name, load, key):
+        self.name = name
+        self.key = key
+        self._load = load
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._generation = None
+        self._snapshot_path = None
+        self._snapshot = None
+        self._rows = None
+
+    def _open(self):
+        # The files are named after the database so that apps pointed at different
+        # databases never share a snapshot
+        url = db.engine.url.render_as_string(hide_password=True)
+        directory = REFERENCE_CACHE_DIR if os.path.isdir(REFERENCE_CACHE_DIR) else tempfile.gettempdir()
+        prefix = os.path.join(directory, f'{self.name}-{hashlib.sha256(url.encode()).hexdigest()[:12]}')
+        fd = os.open(f'{prefix}.generation', os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < _GENERATION.size:
+                os.ftruncate(fd, _GENERATION.size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._generation = mmap.mmap(fd, _GENERATION.size)
+        self._snapshot_path = f'{prefix}.snapshot'
+        self._snapshot = None
+        self._rows = None
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _file_lock(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _read_snapshot(self):
+        try:
+            with open(self._snapshot_path, 'rb') as snapshot_file:
+                snapshot = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(snapshot) < _SNAPSHOT_HEADER.size:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, generation):
+        # The snapshot must include the write that bumped the generation
+        with primary():
+            body = output_json(self._load(), 200).get_data()
+        etag = hashlib.sha256(body).hexdigest()[:32].encode('ascii')
+        header = _SNAPSHOT_HEADER.pack(generation, time.time(), etag, len(body))
+        temporary_path = f'{self._snapshot_path}.{os.getpid()}'
+        with open(temporary_path, 'wb') as snapshot_file:
+            snapshot_file.write(header + body)
+        os.replace(temporary_path, self._snapshot_path)
+
+    def _ensure_open(self):
+        # Files and locks are not shared with the parent process after a fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._open()
+
+    def _current(self):
+        """
+        Returns the mapped snapshot of the current generation, reloading the table
+        if no worker has done it yet.
+        """
+        self._ensure_open()
+        generation, = _GENERATION.unpack_from(self._generation)
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot_generation, loaded_at, _, _ = _SNAPSHOT_HEADER.unpack_from(snapshot)
+            if snapshot_generation == generation and time.time() < loaded_at + REFERENCE_CACHE_TTL:
+                return snapshot
+        with self._lock, self._file_lock():
+            generation, = _GENERATION.unpack_from(self._generation)
+            snapshot = self._read_snapshot()
+            if snapshot is not None:
+                snapshot_generation, loaded_at, _, _ = _SNAPSHOT_HEADER.unpack_from(snapshot)
+                if snapshot_generation != generation or time.time() >= loaded_at + REFERENCE_CACHE_TTL:
+                    snapshot = None
+            if snapshot is None:
+                self._write_snapshot(generation)
+                snapshot = self._read_snapshot()
+            self._snapshot = snapshot
+            self._rows = None
+        return snapshot
+
+    def bump(self):
+        """Invalidates the snapshot in every worker after a write to the table."""
+        self._ensure_open()
+        with self._lock, self._file_lock():
+            generation, = _GENERATION.unpack_from(self._generation)
+            _GENERATION.pack_into(self._generation, 0, generation + 1)
+
+    def payload(self):
+        """
+        Returns the response body and ETag of the current snapshot.
+
+        Returns:
+            tuple: The JSON body (bytes) and its ETag.
+        """
+        return _read_body(self._current())
+
+    def get(self, value):
+        """
+        Looks up a row of the table by its key.
+
+        Args:
+            value: The key of the row.
+
+        Returns:
+            dict: The serialized row, or None if it does not exist.
+        """
+        snapshot = self._current()
+        rows = self._rows
+        if rows is None or rows[0] is not snapshot:
+            body, _ = _read_body(snapshot)
+            rows = self._rows = (snapshot, {row[self.key]: row for row in json.loads(body)})
+        return rows[1].get(value)
+
+    def response(self):
+        """
+        Builds the response of a GET request, honouring If-None-Match.
+
+        Returns:
+            Response: 200 with the cached body, or 304 when the client copy is current.
+        """
+        body, etag = self.payload()
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = REFERENCE_MAX_AGE
+        return response
@@ -9,8 +9,33 @@ from flask_jwt_extended import (
 from models import *
 from schemas import *
 from functions import (
+    PasswordHashingBusy,
     check_valid_password,
-    hash_password
+    hash_password,
+    password_needs_rehash
+)
+from pagination import (
+    paginate,
+    pagination_params
+)
+from export import (
+    export_params,
+    stream_export
+)
+from serializer import serialize_with
+from partitions import (
+    filter_time_range,
+    time_range_params
+)
+from permissions import (
+    permission_required,
+    role_cache,
+    update_permission_matrix
+)
+from principal import (
+    build_principal,
+    principal_claims,
+    principal_loader
 )
 
 
@@ -18,10 +43,14 @@ from functions import (
 def register_routes(api):
     # Namespaces
     ns_login = api.namespace('login', description='Endpoints for login')
-    ns_users = api.namespace('users', description='User operations')
-    ns_roles = api.namespace('roles', description='User roles')
-    ns_logs = api.namespace('logs', description='User logs')
-    ns_access_controls = api.namespace('access_controls', description='User access controls')
+    ns_users = api.namespace('users', description='User operations', decorators=[permission_required('users')])
+    ns_roles = api.namespace('roles', description='User roles', decorators=[permission_required('roles')])
+    ns_logs = api.namespace('logs', description='User logs', decorators=[permission_required('logs')])
+    ns_access_controls = api.namespace('access_controls', description='User access controls', decorators=[permission_required('access_controls')])
+
+    @api.errorhandler(PasswordHashingBusy)
+    def handle_password_hashing_busy(error):
+        return {'message': str(error)}, 503, {'Retry-After': '1'}
     
     @ns_login.route('/')
     class Login(Resource):
@@ -35,11 +64,18 @@ def register_routes(api):
             password = data.get('password')
             if not username or not password:
                 ns_login.abort(400, "Username and password are required")
-            user = User.query.filter_by(username=username).first()
+            user = User.query.options(principal_loader).filter_by(username=username).first()
             if not user:
                 ns_login.abort(400, "User with username provided doesn't exist")
             if check_valid_password(user.hashed_password, password):
-                access_token = create_access_token(identity=user.username)
+                if password_needs_rehash(user.hashed_password):
+                    user.hashed_password = hash_password(password)
+                    db.session.commit()
+                principal = build_principal(user)
+                access_token = create_access_token(
+                    identity=user.username,
+                    additional_claims=principal_claims(principal)
+                )
                 return {
                     'message': 'Login successful', 
                     'access_token': access_token
@@ -49,11 +85,11 @@ def register_routes(api):
     @ns_users.route('/')
     class UserList(Resource):
         @jwt_required()
-        @ns_users.doc('list_users')
-        @ns_users.marshal_list_with(user_output_schema)
+        @ns_users.doc('list_users', params=pagination_params)
+        @serialize_with(user_output_schema, as_list=True)
         def get(self):
             """List all users"""
-            return User.query.order_by(User.id).all()
+            return paginate(User.query.options(user_output_loader), User.id)
         
         @jwt_required()
         @ns_users.doc('create_user')
@@ -64,7 +100,7 @@ def register_routes(api):
             data = request.json
             if User.query.filter_by(username=data['username']).first() is not None:
                 ns_users.abort(400, "Username already exists")
-            if not Role.query.get(data['role_id']):
+            if not role_reference.get(data['role_id']):
                 ns_users.abort(400, "Role not found")
             new_user = User(
                 username=data['username'], 
@@ -84,7 +120,7 @@ def register_routes(api):
         @ns_users.marshal_with(user_output_schema)
         def get(self, user_id):
             """Fetch a user given its identifier"""
-            user = User.query.get(user_id)
+            user = User.query.options(user_output_loader).get(user_id)
             if not user:
                 ns_users.abort(404, "User not found")
             return user
@@ -99,6 +135,7 @@ def register_routes(api):
                 ns_users.abort(404, "User not found")
             db.session.delete(user_to_delete)
             db.session.commit()
+            role_cache.invalidate(user_id)
             return f"User with ID {user_id} has been deleted.", 204
             
         @jwt_required()
@@ -116,6 +153,7 @@ def register_routes(api):
                 user_to_update.hashed_password = hash_password(data['password'])
                 user_to_update.role_id = data['role_id']
                 db.session.commit()
+                role_cache.invalidate(user_id)
                 return user_to_update
             ns_users.abort(404, "User not found")
 
@@ -124,10 +162,11 @@ def register_routes(api):
     class RoleList(Resource):
         @jwt_required()
         @ns_roles.doc('list_roles')
-        @ns_roles.marshal_list_with(role_output_schema)
+        @ns_roles.response(200, 'Success', [role_output_schema])
+        @ns_roles.response(304, 'Not modified')
         def get(self):
             """List all roles"""
-            return Role.query.order_by(Role.id).all()
+            return role_reference.response()
     
         @jwt_required()
         @ns_roles.doc('create_person')
@@ -139,6 +178,7 @@ def register_routes(api):
             new_person = Role(name=data['name'])
             db.session.add(new_person)
             db.session.commit()
+            role_reference.bump()
             return new_person
     
     @ns_roles.route('/<int:role_id>')
@@ -150,7 +190,7 @@ def register_routes(api):
         @ns_roles.marshal_with(role_output_schema)
         def get(self, role_id):
             """Fetch a role given its identifier"""
-            role = Role.query.get(role_id)
+            role = role_reference.get(role_id)
             if not role:
                 ns_roles.abort(404, "Role not found")
             return role
@@ -165,6 +205,7 @@ def register_routes(api):
                 ns_roles.abort(404, "Role not found")
             db.session.delete(role_to_delete)
             db.session.commit()
+            role_reference.bump()
             return f"Role with ID {role_id} has been deleted.", 204
 
         @jwt_required()
@@ -178,6 +219,7 @@ def register_routes(api):
             if role_to_update:
                 role_to_update.name = data['name']
                 db.session.commit()
+                role_reference.bump()
                 return role_to_update
             ns_roles.abort(404, "Role not found")
 
@@ -185,11 +227,11 @@ def register_routes(api):
     @ns_logs.route('/')
     class LogList(Resource):
         @jwt_required()
-        @ns_logs.doc('list_logs')
-        @ns_logs.marshal_list_with(log_output_schema)
+        @ns_logs.doc('list_logs', params={**pagination_params, **time_range_params})
+        @serialize_with(log_output_schema, as_list=True)
         def get(self):
             """List all logs"""
-            return Log.query.order_by(Log.id).all()
+            return paginate(filter_time_range(Log.query, Log.timestamp), Log.id)
     
         @jwt_required()
         @ns_logs.doc('create_log')
@@ -214,6 +256,16 @@ def register_routes(api):
             db.session.commit()
             return new_log
     
+    @ns_logs.route('/export')
+    class LogExport(Resource):
+        @jwt_required()
+        @ns_logs.doc('export_logs', params={**export_params, **time_range_params})
+        @ns_logs.produces(['application/x-ndjson', 'text/csv'])
+        def get(self):
+            """Export all logs as NDJSON or CSV"""
+            statement = filter_time_range(db.select(Log), Log.timestamp).order_by(Log.id)
+            return stream_export(statement, log_output_schema, 'logs')
+
     @ns_logs.route('/<int:log_id>')
     @ns_logs.response(404, 'Log not found')
     @ns_logs.param('log_id', 'The log identifier')
@@ -232,11 +284,11 @@ def register_routes(api):
     @ns_access_controls.route('/')
     class AccessControlList(Resource):
         @jwt_required()
-        @ns_access_controls.doc('list_access_control')
-        @ns_access_controls.marshal_list_with(access_control_output_schema)
+        @ns_access_controls.doc('list_access_control', params=pagination_params)
+        @serialize_with(access_control_output_schema, as_list=True)
         def get(self):
             """List all access controls"""
-            return AccessControl.query.order_by(AccessControl.id).all()
+            return paginate(AccessControl.query, AccessControl.id)
     
         @jwt_required()
         @ns_access_controls.doc('create_access_control')
@@ -250,7 +302,7 @@ def register_routes(api):
             read_permission = data['read_permission']
             write_permission = data['write_permission']
 
-            if not Role.query.get(role_id):
+            if not role_reference.get(role_id):
                 ns_access_controls.abort(404, "Role not found")
             
             new_access_control = AccessControl(
@@ -261,6 +313,8 @@ def register_routes(api):
         )
             db.session.add(new_access_control)
             db.session.commit()
+            role_reference.bump()
+            update_permission_matrix(role_id, resource)
             return new_access_control
     
     @ns_access_controls.route('/<int:access_control_id>')
@@ -285,8 +339,11 @@ def register_routes(api):
             access_control_to_delete = AccessControl.query.get(access_control_id)
             if not access_control_to_delete:
                 ns_access_controls.abort(404, "Access control not found")
+            role_id, resource = access_control_to_delete.role_id, access_control_to_delete.resource
             db.session.delete(access_control_to_delete)
             db.session.commit()
+            role_reference.bump()
+            update_permission_matrix(role_id, resource)
             return f"Access control with ID {access_control_id} has been deleted.", 204
 
         @jwt_required()
@@ -298,10 +355,14 @@ def register_routes(api):
             data = request.json
             access_control_to_update = AccessControl.query.get(access_control_id)
             if access_control_to_update:
+                previous = access_control_to_update.role_id, access_control_to_update.resource
                 access_control_to_update.role_id = data['role_id']
                 access_control_to_update.resource = data['resource']
                 access_control_to_update.read_permission = data['read_permission']
                 access_control_to_update.write_permission = data['write_permission']
                 db.session.commit()
+                role_reference.bump()
+                update_permission_matrix(*previous)
+                update_permission_matrix(access_control_to_update.role_id, access_control_to_update.resource)
                 return access_control_to_update
             ns_access_controls.abort(404, "Access control not found")
\ No newline at end of file
@@ -1,5 +1,9 @@
 from flask_restx import fields
+from sqlalchemy.orm import joinedload, selectinload
 from __init__ import api
+from models import Role, User
+from reference import ReferenceData
+from serializer import serialize
 
 
 
@@ -41,6 +45,9 @@ role_output_schema = api.model('RoleOutput', {
     'access_controls': fields.List(fields.Nested(access_control_output_schema))
 })
 
+# Relationships serialized by role_output_schema, loaded up front to avoid N+1 queries
+role_output_loader = selectinload(Role.access_controls)
+
 login_schema = api.model('Login', {
     'username': fields.String(required=True, description='Username'),
     'password': fields.String(required=True, description='Password')
@@ -58,4 +65,14 @@ user_output_schema = api.model('UserOutput', {
     'hashed_password': fields.String(required=True, description='Password'),
     'role_id': fields.Integer(required=True, description='Role ID'),
     'role': fields.List(fields.Nested(role_output_schema))
-})
\ No newline at end of file
+})
+
+# Relationships serialized by user_output_schema, loaded up front to avoid N+1 queries
+user_output_loader = joinedload(User.role).selectinload(Role.access_controls)
+
+# Cached GET /roles/ response, bumped by the role and access control write endpoints
+role_reference = ReferenceData(
+    'roles',
+    lambda: serialize(Role.query.options(role_output_loader).order_by(Role.id).all(), role_output_schema),
+    key='id'
+)
\ No newline at end of file
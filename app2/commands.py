@@ -0,0 +1,39 @@
+# Flask
+import click
+# SQLAlchemy
+from sqlalchemy.schema import CreateIndex, CreateSchema
+# App
+from __init__ import db
+
+
+def init_db():
+    """
+    Creates the database schema of the app with its tables and indexes. Every
+    statement is idempotent, so it is safe to run on every deployment.
+    """
+    schemas = {table.schema for table in db.metadata.sorted_tables if table.schema}
+    with db.engine.connect() as conn:
+        for schema in sorted(schemas):
+            conn.execute(CreateSchema(schema, if_not_exists=True))
+        conn.commit()
+    db.create_all()
+    with db.engine.connect() as conn:
+        # create_all skips indexes of tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        conn.commit()
+
+
+def register_commands(app):
+    """
+    Registers the CLI commands of the app, run with ``flask --app wsgi <command>``.
+
+    Args:
+        app: The Flask app.
+    """
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema, tables and indexes."""
+        init_db()
+        click.echo('Database initialized')
@@ -0,0 +1,81 @@
+# Flask
+from flask import Response, request, stream_with_context
+from flask_restx import abort
+# Python
+import csv
+import io
+import json
+# App
+from __init__ import db
+from constants import EXPORT_BATCH_SIZE
+from serializer import serialize
+
+
+export_params = {
+    'format': "'ndjson' (default) or 'csv'"
+}
+
+
+def _ndjson_chunks(rows, model):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(serialize(row, model), separators=(',', ':')))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_chunks(rows, model):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(model.keys())
+    count = 0
+    for row in rows:
+        data = serialize(row, model)
+        # Nested lists (e.g. order items) don't fit in a cell, they are kept as JSON
+        writer.writerow(
+            json.dumps(value, separators=(',', ':')) if isinstance(value, (list, dict)) else value
+            for value in data.values()
+        )
+        count += 1
+        if count == EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
+
+
+def stream_export(statement, model, filename):
+    """
+    Streams the result of a query as NDJSON or CSV, as selected by the ``format``
+    query parameter, without materializing it.
+
+    Rows are fetched EXPORT_BATCH_SIZE at a time through a server-side cursor
+    (``yield_per``), marshalled with the same model as the JSON endpoints and sent
+    as they are produced, so memory use doesn't grow with the size of the table.
+
+    Args:
+        statement: A SQLAlchemy select() of the rows to export, with its ordering
+            and the loader options of the relationships the model serializes.
+        model: The api.model used to serialize each row.
+        filename (str): The name of the download, without extension.
+
+    Returns:
+        Response: A streamed response.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format == 'ndjson':
+        chunks, mimetype = _ndjson_chunks, 'application/x-ndjson'
+    elif export_format == 'csv':
+        chunks, mimetype = _csv_chunks, 'text/csv'
+    else:
+        abort(400, "format must be 'ndjson' or 'csv'")
+    rows = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)).scalars()
+    return Response(
+        stream_with_context(chunks(rows, model)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'}
+    )
@@ -5,23 +5,33 @@ from flask_jwt_extended import jwt_required
 # App
 from models import *
 from schemas import *
+from pagination import (
+    paginate,
+    pagination_params
+)
+from export import (
+    export_params,
+    stream_export
+)
+from serializer import serialize_with
+from permissions import permission_required
 
 
 def register_routes(api):
     # Namespaces
-    ns_customer = api.namespace('customer', description = 'Endpoints for customer')
-    ns_address = api.namespace('address', description = 'Endpoints for address')
+    ns_customer = api.namespace('customer', description = 'Endpoints for customer', decorators=[permission_required('customer')])
+    ns_address = api.namespace('address', description = 'Endpoints for address', decorators=[permission_required('address')])
 
     # Routes
         
     @ns_customer.route('/')
     class CustomerList(Resource):
         @jwt_required()
-        @ns_customer.doc('list_customers')
-        @ns_customer.marshal_list_with(output_customer_schema)
+        @ns_customer.doc('list_customers', params=pagination_params)
+        @serialize_with(output_customer_schema, as_list=True)
         def get(self):
             """List all customers"""
-            return Customer.query.all()
+            return paginate(Customer.query.options(output_customer_loader), Customer.customer_id)
         
         @jwt_required()
         @ns_customer.doc('create_customer')
@@ -40,6 +50,16 @@ def register_routes(api):
             db.session.commit()
             return new_customer
    
+    @ns_customer.route('/export')
+    class CustomerExport(Resource):
+        @jwt_required()
+        @ns_customer.doc('export_customers', params=export_params)
+        @ns_customer.produces(['application/x-ndjson', 'text/csv'])
+        def get(self):
+            """Export all customers with their addresses as NDJSON or CSV"""
+            statement = db.select(Customer).options(output_customer_loader).order_by(Customer.customer_id)
+            return stream_export(statement, output_customer_schema, 'customers')
+   
     @ns_customer.route('/<int:customer_id>')
     @ns_customer.response(404, 'Customer not found')
     @ns_customer.param('customer_id', 'The customer identifier')
@@ -49,7 +69,7 @@ def register_routes(api):
         @ns_customer.marshal_with(output_customer_schema)
         def get(self, customer_id):
             """Fetch a customer given its identifier"""
-            customer = Customer.query.get(customer_id)
+            customer = Customer.query.options(output_customer_loader).get(customer_id)
             if not customer:
                 ns_customer.abort(404, "Customer not found")
             return customer
@@ -89,11 +109,11 @@ def register_routes(api):
     @ns_address.route('/')
     class AddressList(Resource):
         @jwt_required()
-        @ns_address.doc('list_address')
-        @ns_address.marshal_list_with(output_address_schema)
+        @ns_address.doc('list_address', params=pagination_params)
+        @serialize_with(output_address_schema, as_list=True)
         def get(self):
             """List all addresses"""
-            return Address.query.all()
+            return paginate(Address.query.options(output_address_loader), Address.address_id)
         
         @jwt_required()
         @ns_address.doc('create_address')
@@ -126,7 +146,7 @@ def register_routes(api):
         @ns_address.marshal_with(output_address_schema)
         def get(self, address_id):
             """Fetch an address given its identifier"""
-            address = Address.query.get(address_id)
+            address = Address.query.options(output_address_loader).get(address_id)
             if not address:
                 ns_address.abort(404, "Address not found")
             return address
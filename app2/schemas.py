@@ -1,5 +1,7 @@
 from flask_restx import fields
+from sqlalchemy.orm import joinedload, selectinload
 from __init__ import api
+from models import Address, Customer
 
 input_customer_schema = api.model('Input_Customer', {
     'type': fields.String(description='The type of the customer'),
@@ -52,4 +54,8 @@ output_address_schema['customer'] = fields.List(fields.Nested(api.model('Output_
 })))
 
 api.models['Output_Customer'] = output_customer_schema
-api.models['Output_Address'] = output_address_schema
\ No newline at end of file
+api.models['Output_Address'] = output_address_schema
+
+# Relationships serialized by the output schemas, loaded up front to avoid N+1 queries
+output_customer_loader = selectinload(Customer.address)
+output_address_loader = joinedload(Address.customer)
\ No newline at end of file
@@ -0,0 +1,170 @@
+# Flask
+from flask import request
+from flask_jwt_extended import get_jwt, jwt_required
+# SQLAlchemy
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert
+from sqlalchemy.exc import DataError, IntegrityError
+# Python
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+# App
+from __init__ import db
+from constants import (
+    AUDIT_LOG_BATCH_SIZE,
+    AUDIT_LOG_ENABLED,
+    AUDIT_LOG_FLUSH_INTERVAL,
+    AUDIT_LOG_QUEUE_SIZE
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Core table for Security.Log, so that every service can write audit entries
+# without the app1 models.
+log_table = Table(
+    'Log', MetaData(schema='Security'),
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, nullable=False),
+    Column('action', String(255), nullable=False),
+    Column('timestamp', DateTime, nullable=False)
+)
+
+
+class AuditLogger:
+    """
+    Buffers audit entries in a bounded queue and writes them to Security.Log from a
+    background thread, with one multi-row INSERT per batch. A batch is flushed when
+    it reaches AUDIT_LOG_BATCH_SIZE entries or after AUDIT_LOG_FLUSH_INTERVAL seconds.
+    If the database rejects one of its rows, e.g. for an unknown user, the batch is
+    written again one row at a time so that only the offending entries are lost.
+    Entries are dropped, and counted, when the queue is full, so that requests never
+    wait on the audit write.
+    """
+
+    def __init__(self, queue_size, batch_size, flush_interval):
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        self._app = app
+        if AUDIT_LOG_ENABLED:
+            app.after_request(record_request)
+        app.add_url_rule('/audit/metrics', 'audit_metrics', jwt_required()(self.metrics))
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        # The writer thread doesn't survive a fork, so each worker starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue_size)
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def log(self, user_id, action, timestamp=None):
+        """
+        Queues an audit entry without blocking.
+
+        Args:
+            user_id (int): The user that performed the action.
+            action (str): A description of the action, truncated to 255 characters.
+            timestamp (datetime): When the action happened, defaults to now.
+        """
+        self._ensure_started()
+        entry = {'user_id': user_id, 'action': action[:255], 'timestamp': timestamp or datetime.now()}
+        try:
+            self._queue.put_nowait(entry)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with self._app.app_context():
+            engine = db.engine
+        while True:
+            batch = []
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(engine, batch)
+            if self._stopping.is_set() and self._queue.empty():
+                return
+
+    def _flush(self, engine, batch):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(log_table), batch)
+            self.flushed += len(batch)
+        except (DataError, IntegrityError):
+            if len(batch) == 1:
+                self.failed += 1
+                logger.exception("Failed to write an audit log entry: %s", batch[0])
+                return
+            for entry in batch:
+                self._flush(engine, [entry])
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d audit log entries", len(batch))
+
+    def shutdown(self, timeout=5):
+        """Flushes the queued entries and stops the writer thread."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Counters of enqueued, flushed, dropped and failed entries, and the
+            number of entries currently queued.
+        """
+        return {
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0
+        }
+
+
+audit_logger = AuditLogger(AUDIT_LOG_QUEUE_SIZE, AUDIT_LOG_BATCH_SIZE, AUDIT_LOG_FLUSH_INTERVAL)
+
+
+def record_request(response):
+    """
+    after_request hook that audits every request made with a valid access token.
+    """
+    try:
+        user_id = get_jwt().get('uid')
+    except RuntimeError:
+        return response
+    if user_id is not None:
+        audit_logger.log(user_id, f'{request.method} {request.full_path.rstrip("?")} {response.status_code}')
+    return response
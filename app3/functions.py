@@ -0,0 +1,372 @@
+# Flask
+from flask import request
+from flask_restx import abort
+# SQLAlchemy
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DBAPIError
+# Python
+import json
+from datetime import datetime
+from itertools import islice
+# App
+from __init__ import db
+from constants import (
+    BULK_CHUNK_SIZE,
+    BULK_MAX_RECORDS,
+    SEARCH_MAX_RESULTS
+)
+from models import Order, OrderItem
+from pricing import (
+    INVALID_ITEMS,
+    price_orders,
+    totals_by_shipment_type
+)
+from schemas import (
+    order_loader,
+    shipment_type_reference
+)
+from pagination import (
+    decode_cursor,
+    encode_cursor,
+    next_link,
+    page_size
+)
+
+
+_trigram_available = None
+
+
+def create_search_indexes(conn):
+    """
+    Enables pg_trgm and creates the trigram (GIN) index used by substring searches on
+    Order.sender_name. Does nothing on databases other than PostgreSQL, or when the
+    extension cannot be installed, in which case searches fall back to a plain ILIKE.
+
+    Args:
+        conn: An open SQLAlchemy connection used for schema setup.
+
+    Returns:
+        bool: True if the trigram index is available, False otherwise.
+    """
+    if conn.dialect.name != 'postgresql':
+        return False
+    try:
+        with conn.begin_nested():
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except DBAPIError:
+        return False
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_order_sender_name_trgm '
+        'ON order_schema."Order" USING gin (sender_name gin_trgm_ops)'
+    ))
+    return True
+
+
+def trigram_available():
+    """
+    Checks once per process whether the pg_trgm extension is installed.
+
+    Returns:
+        bool: True if similarity ranking can be used, False otherwise.
+    """
+    global _trigram_available
+    if _trigram_available is None:
+        if db.engine.dialect.name != 'postgresql':
+            _trigram_available = False
+        else:
+            found = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first()
+            _trigram_available = found is not None
+    return _trigram_available
+
+
+def escape_like(value):
+    """
+    Escapes the LIKE wildcards in a user supplied search term.
+
+    Args:
+        value (str): The raw search term.
+
+    Returns:
+        str: The term with backslash, percent and underscore escaped.
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_orders_by_sender_name(sender_name, mode):
+    """
+    Searches orders by sender name, returning one page of at most SEARCH_MAX_RESULTS
+    ranked results.
+
+    In ``prefix`` mode the search is ``lower(sender_name) LIKE 'term%'``, served by the
+    ix_order_sender_name_prefix btree index. In ``contains`` mode it is an ILIKE served by
+    the trigram index and ranked by similarity when pg_trgm is available.
+
+    Args:
+        sender_name (str): The search term.
+        mode (str): Either 'contains' or 'prefix'.
+
+    Returns:
+        tuple: The orders of the page, status code 200 and the response headers,
+        including a ``Link`` header with ``rel="next"`` when more results exist.
+    """
+    term = escape_like(sender_name)
+    if mode == 'prefix':
+        sender_name_lower = db.func.lower(Order.sender_name)
+        query = Order.query.options(order_loader).filter(sender_name_lower.like(f'{term.lower()}%', escape='\\'))
+        query = query.order_by(sender_name_lower, Order.order_id)
+    elif mode == 'contains':
+        query = Order.query.options(order_loader).filter(Order.sender_name.ilike(f'%{term}%', escape='\\'))
+        if trigram_available():
+            query = query.order_by(db.func.similarity(Order.sender_name, sender_name).desc(), Order.order_id)
+        else:
+            query = query.order_by(Order.order_id)
+    else:
+        abort(400, "mode must be 'contains' or 'prefix'")
+
+    limit = page_size()
+    offset = decode_cursor(request.args.get('cursor')) or 0
+    if type(offset) is bool or not isinstance(offset, int) or offset < 0:
+        abort(400, "Invalid cursor")
+    limit = min(limit, SEARCH_MAX_RESULTS - offset)
+    if limit <= 0:
+        return [], 200, {}
+    rows = query.offset(offset).limit(limit + 1).all()
+    headers = {}
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more and offset + limit < SEARCH_MAX_RESULTS:
+        cursor = encode_cursor(offset + limit)
+        headers['Link'] = f'<{next_link(cursor, limit)}>; rel="next"'
+        headers['X-Next-Cursor'] = cursor
+    return rows, 200, headers
+
+
+
+ORDER_FIELDS = (
+    'sender_id', 'sender_address', 'sender_name', 'receiver_id', 'receiver_name',
+    'receiver_address', 'receiver_phone', 'order_date', 'total_amount', 'shipment_type_id'
+)
+ORDER_ITEM_FIELDS = ('weight', 'length', 'width', 'height', 'quantity', 'price')
+
+
+def iter_bulk_records():
+    """
+    Reads the records of a bulk request, either a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson) with one JSON object per line.
+
+    Yields:
+        The decoded records, or None for NDJSON lines that are not valid JSON.
+        Aborts with 413 past BULK_MAX_RECORDS, before reading the rest of an
+        NDJSON stream.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        count = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            count += 1
+            if count > BULK_MAX_RECORDS:
+                abort(413, f"A bulk request can contain at most {BULK_MAX_RECORDS} records")
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            abort(400, "Request body must be a JSON array or NDJSON stream")
+        if len(data) > BULK_MAX_RECORDS:
+            abort(413, f"A bulk request can contain at most {BULK_MAX_RECORDS} records")
+        yield from data
+
+
+def parse_order_record(record):
+    """
+    Validates one order of a bulk request and splits it into table rows.
+
+    Args:
+        record: The decoded order, with its items under the 'items' key.
+
+    Returns:
+        tuple: The order row and its item rows, ready for a multi-row INSERT.
+
+    Raises:
+        ValueError: If the record is not a valid order.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Order must be a JSON object")
+    items = record.get('items') or []
+    unknown = set(record) - set(ORDER_FIELDS) - {'items'}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("items must be a list of objects")
+    for item in items:
+        unknown = set(item) - set(ORDER_ITEM_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown item fields: {', '.join(sorted(unknown))}")
+    order_row = {field: record.get(field) for field in ORDER_FIELDS}
+    if order_row['shipment_type_id'] is not None and not shipment_type_reference.get(order_row['shipment_type_id']):
+        raise ValueError("Shipment type not found")
+    if order_row['order_date'] is not None:
+        order_row['order_date'] = datetime.fromisoformat(order_row['order_date'])
+    item_rows = [{field: item.get(field) for field in ORDER_ITEM_FIELDS} for item in items]
+    return order_row, item_rows
+
+
+def insert_orders(orders):
+    """
+    Inserts a chunk of orders and their items with one multi-row INSERT per table
+    inside the current transaction.
+
+    Args:
+        orders (list): (order_row, item_rows) tuples as returned by parse_order_record.
+
+    Returns:
+        list: The generated order IDs, in the same order as the input.
+    """
+    order_ids = db.session.execute(
+        insert(Order).returning(Order.order_id, sort_by_parameter_order=True),
+        [order_row for order_row, _ in orders]
+    ).scalars().all()
+    item_rows = [
+        dict(item_row, order_id=order_id)
+        for order_id, (_, rows) in zip(order_ids, orders)
+        for item_row in rows
+    ]
+    if item_rows:
+        db.session.execute(insert(OrderItem), item_rows)
+    return order_ids
+
+
+def create_orders_in_bulk(records):
+    """
+    Creates orders with their items in chunks of BULK_CHUNK_SIZE, committing once
+    per chunk. If a chunk is rejected by the database, its orders are retried one
+    by one so that only the offending records fail. An NDJSON stream longer than
+    BULK_MAX_RECORDS is rejected with 413 when the record past the limit is read;
+    the chunks committed before it are kept.
+
+    Args:
+        records: An iterable of decoded orders, as yielded by iter_bulk_records.
+
+    Returns:
+        dict: The number of created and failed orders and a result per record
+        with its index in the request and either its order_id or an error.
+    """
+    results = []
+    records = enumerate(records)
+    while True:
+        chunk = list(islice(records, BULK_CHUNK_SIZE))
+        if not chunk:
+            break
+        valid = []
+        for index, record in chunk:
+            try:
+                valid.append((index, parse_order_record(record)))
+            except (ValueError, TypeError) as error:
+                results.append({'index': index, 'status': 'error', 'error': str(error)})
+        # Totals are computed here, whatever the client sent
+        quote = price_orders([(order_row['shipment_type_id'], item_rows) for _, (order_row, item_rows) in valid])
+        priced = []
+        for (index, order), invalid, total in zip(valid, quote.invalid.tolist(), quote.order_total.tolist()):
+            if invalid:
+                results.append({'index': index, 'status': 'error', 'error': INVALID_ITEMS})
+            else:
+                order[0]['total_amount'] = total
+                priced.append((index, order))
+        valid = priced
+        if not valid:
+            continue
+        try:
+            order_ids = insert_orders([order for _, order in valid])
+            db.session.commit()
+        except DBAPIError:
+            db.session.rollback()
+            for index, order in valid:
+                try:
+                    order_id, = insert_orders([order])
+                    db.session.commit()
+                except DBAPIError as error:
+                    db.session.rollback()
+                    results.append({'index': index, 'status': 'error', 'error': str(error.orig)})
+                else:
+                    results.append({'index': index, 'status': 'created', 'order_id': order_id})
+        else:
+            for (index, _), order_id in zip(valid, order_ids):
+                results.append({'index': index, 'status': 'created', 'order_id': order_id})
+    results.sort(key=lambda result: result['index'])
+    created = sum(1 for result in results if result['status'] == 'created')
+    return {'created': created, 'failed': len(results) - created, 'results': results}
+
+
+def quote_orders(records):
+    """
+    Prices a manifest of orders in one pass without storing them: every valid order
+    gets its total, chargeable weight and per item breakdown, and the valid orders
+    are added up by shipment type. An NDJSON stream longer than BULK_MAX_RECORDS
+    is rejected with 413.
+
+    Args:
+        records: An iterable of decoded orders, as yielded by iter_bulk_records.
+
+    Returns:
+        dict: The number of quoted and failed orders, a result per record with its
+        index in the request, and the totals by shipment type.
+    """
+    results = []
+    parsed = []
+    for index, record in enumerate(records):
+        try:
+            parsed.append((index, parse_order_record(record)))
+        except (ValueError, TypeError) as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+    shipment_type_ids = [order_row['shipment_type_id'] for _, (order_row, _) in parsed]
+    quote = price_orders([
+        (shipment_type_id, item_rows)
+        for shipment_type_id, (_, (_, item_rows)) in zip(shipment_type_ids, parsed)
+    ])
+    # Converted to Python lists once: indexing NumPy arrays item by item is slow
+    lines = list(zip(
+        quote.volumetric_weight.round(3).tolist(),
+        quote.chargeable_weight.round(3).tolist(),
+        quote.freight.tolist(),
+        quote.line_total.tolist()
+    ))
+    orders = zip(
+        parsed, quote.invalid.tolist(), quote.order_total.tolist(),
+        quote.order_chargeable_weight.round(3).tolist()
+    )
+    position = 0
+    for (index, (_, item_rows)), invalid, total, chargeable_weight in orders:
+        end = position + len(item_rows)
+        if invalid:
+            results.append({'index': index, 'status': 'error', 'error': INVALID_ITEMS})
+        else:
+            results.append({
+                'index': index,
+                'status': 'quoted',
+                'total_amount': total,
+                'chargeable_weight': chargeable_weight,
+                'items': [
+                    {
+                        'volumetric_weight': volumetric_weight,
+                        'chargeable_weight': line_weight,
+                        'freight': freight,
+                        'line_total': line_total
+                    }
+                    for volumetric_weight, line_weight, freight, line_total in lines[position:end]
+                ]
+            })
+        position = end
+    results.sort(key=lambda result: result['index'])
+    quoted = sum(1 for result in results if result['status'] == 'quoted')
+    return {
+        'quoted': quoted,
+        'failed': len(results) - quoted,
+        'results': results,
+        'totals': totals_by_shipment_type(shipment_type_ids, quote)
+    }
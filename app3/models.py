@@ -25,6 +25,14 @@ class Order(db.Model):
     shipment_type_id = db.Column(db.Integer, db.ForeignKey('order_schema.Shipment_Type.shipment_type_id'))
     items = db.relationship("OrderItem", back_populates="order")
 
+# Btree index for prefix searches on sender_name. The trigram (GIN) index used
+# for substring searches needs pg_trgm and is created by create_search_indexes.
+db.Index(
+    'ix_order_sender_name_prefix',
+    db.func.lower(Order.sender_name).label('sender_name_lower'),
+    postgresql_ops={'sender_name_lower': 'text_pattern_ops'}
+)
+
 class OrderItem(db.Model):
     __tablename__ = 'Order_Item'
     __table_args__ = {'schema': 'order_schema'}
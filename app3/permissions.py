@@ -0,0 +1,210 @@
+# Flask
+from flask import request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_restx import abort
+# SQLAlchemy
+from sqlalchemy import text
+# Python
+import threading
+import time
+from functools import wraps
+# App
+from __init__ import db
+from constants import (
+    RBAC_ENABLED,
+    RBAC_REFRESH_INTERVAL
+)
+
+
+READ = 'read'
+WRITE = 'write'
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class PermissionMatrix:
+    """
+    In-memory view of the Security.AccessControl table. Resource names are interned
+    to bit positions and each role holds one bitset for read and one for write, so
+    that a check is two dict lookups and a bit test.
+    """
+
+    def __init__(self):
+        self._resource_ids = {}
+        self._read = {}
+        self._write = {}
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    def _resource_bit(self, resource):
+        resource_id = self._resource_ids.get(resource)
+        if resource_id is None:
+            resource_id = self._resource_ids.setdefault(resource, len(self._resource_ids))
+        return 1 << resource_id
+
+    def load(self, rows):
+        """
+        Rebuilds the matrix from (role_id, resource, read_permission, write_permission)
+        rows. Permissions of duplicated (role, resource) rows are combined.
+        """
+        with self._lock:
+            read, write = {}, {}
+            for role_id, resource, read_permission, write_permission in rows:
+                bit = self._resource_bit(resource)
+                if read_permission:
+                    read[role_id] = read.get(role_id, 0) | bit
+                if write_permission:
+                    write[role_id] = write.get(role_id, 0) | bit
+            self._read, self._write = read, write
+            self.loaded_at = time.monotonic()
+
+    def update(self, role_id, resource, rows):
+        """
+        Replaces the permissions of a role on a resource with those of its remaining
+        (read_permission, write_permission) rows, combined as in ``load``, so that
+        changing or deleting one of several duplicated rows keeps the others.
+        """
+        read_permission = any(read for read, _ in rows)
+        write_permission = any(write for _, write in rows)
+        with self._lock:
+            bit = self._resource_bit(resource)
+            for bitsets, allowed in ((self._read, read_permission), (self._write, write_permission)):
+                bits = bitsets.get(role_id, 0)
+                bitsets[role_id] = bits | bit if allowed else bits & ~bit
+
+    def can(self, role_id, resource, mode=READ):
+        """
+        Checks if a role may read or write a resource.
+
+        Args:
+            role_id (int): The role of the caller.
+            resource (str): The resource name, e.g. 'shipment'.
+            mode (str): READ or WRITE.
+
+        Returns:
+            bool: True if the access is allowed, False otherwise.
+        """
+        resource_id = self._resource_ids.get(resource)
+        if resource_id is None:
+            return False
+        bitsets = self._read if mode == READ else self._write
+        return bool(bitsets.get(role_id, 0) >> resource_id & 1)
+
+
+class RoleCache:
+    """
+    Process level cache from a user ID to the current role of the user, so that a
+    user moved to another role or deleted loses the previous permissions within a
+    TTL instead of keeping the role_id claim of their token until it expires.
+    app1 also drops the entry of a user it changes or deletes.
+    """
+
+    def __init__(self, ttl):
+        self._ttl = ttl
+        self._entries = {}
+
+    def role_id(self, user_id):
+        """
+        Args:
+            user_id (int): The uid claim of the access token.
+
+        Returns:
+            int: The role of the user, or None if the user no longer exists.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        role_id = db.session.execute(
+            text('SELECT role_id FROM "Security"."User" WHERE id = :user_id'),
+            {'user_id': user_id}
+        ).scalar()
+        self._entries[user_id] = (role_id, time.monotonic() + self._ttl)
+        return role_id
+
+    def invalidate(self, user_id):
+        """Drops the entry of a user, so that the next check reads its role again."""
+        self._entries.pop(user_id, None)
+
+
+permission_matrix = PermissionMatrix()
+role_cache = RoleCache(RBAC_REFRESH_INTERVAL)
+_reload_lock = threading.Lock()
+
+
+def load_permission_matrix():
+    """
+    Loads the matrix from the AccessControl table, which every service can read
+    since they share the database. Called on first use and then every
+    RBAC_REFRESH_INTERVAL seconds to pick up changes made through app1.
+    """
+    rows = db.session.execute(text(
+        'SELECT role_id, resource, read_permission, write_permission '
+        'FROM "Security"."AccessControl"'
+    )).all()
+    permission_matrix.load(rows)
+
+
+def refresh_permission_matrix():
+    """
+    Loads the matrix if it was never loaded or is older than RBAC_REFRESH_INTERVAL.
+    A single request thread reloads it at a time: the others keep checking against
+    the current matrix meanwhile, and only wait for the first load.
+    """
+    loaded_at = permission_matrix.loaded_at
+    if loaded_at is not None and time.monotonic() - loaded_at <= RBAC_REFRESH_INTERVAL:
+        return
+    if not _reload_lock.acquire(blocking=loaded_at is None):
+        return
+    try:
+        # Another thread may have loaded it while this one waited for the lock
+        loaded_at = permission_matrix.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > RBAC_REFRESH_INTERVAL:
+            load_permission_matrix()
+    finally:
+        _reload_lock.release()
+
+
+def update_permission_matrix(role_id, resource):
+    """
+    Recomputes the permissions of a role on a resource from the AccessControl table,
+    after app1 creates, changes or deletes one of its rows.
+
+    Args:
+        role_id (int): The role of the changed row.
+        resource (str): The resource of the changed row.
+    """
+    rows = db.session.execute(text(
+        'SELECT read_permission, write_permission '
+        'FROM "Security"."AccessControl" '
+        'WHERE role_id = :role_id AND resource = :resource'
+    ), {'role_id': role_id, 'resource': resource}).all()
+    permission_matrix.update(role_id, resource, rows)
+
+
+def permission_required(resource, mode=None):
+    """
+    Route decorator that checks the current role of the caller (the uid claim of the
+    access token, looked up in role_cache) against the permission matrix, aborting
+    with 403 if the access is not allowed. It can decorate a single method or a
+    whole namespace through its ``decorators`` argument. It is a no-op unless
+    RBAC_ENABLED is set.
+
+    Args:
+        resource (str): The resource name, as stored in AccessControl.resource.
+        mode (str): READ or WRITE, or None to derive it from the HTTP method.
+    """
+    def decorator(fn):
+        if not RBAC_ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            refresh_permission_matrix()
+            required = mode or (READ if request.method in SAFE_METHODS else WRITE)
+            user_id = get_jwt().get('uid')
+            role_id = role_cache.role_id(user_id) if user_id is not None else None
+            if not permission_matrix.can(role_id, resource, required):
+                abort(403, f"Not allowed to {required} {resource}")
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
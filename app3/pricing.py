@@ -0,0 +1,196 @@
+# NumPy
+import numpy as np
+# Python
+from collections import namedtuple
+# App
+from constants import (
+    PRICING_BASE_FEE,
+    PRICING_RATE_PER_KG,
+    PRICING_RATES,
+    PRICING_VOLUMETRIC_DIVISOR
+)
+
+
+ITEM_FIELDS = ('weight', 'length', 'width', 'height', 'quantity', 'price')
+
+INVALID_ITEMS = "Item weight, dimensions, quantity and price must be non-negative numbers and quantity a whole number"
+
+# Largest quantity OrderItem.quantity (a 32-bit integer column) can store
+MAX_QUANTITY = 2 ** 31 - 1
+
+# Per item: index of its order, volumetric weight of one unit, chargeable weight of
+# the line, freight and line total. Per order: total, chargeable weight and whether
+# one of its items is invalid.
+Quote = namedtuple('Quote', (
+    'order_index', 'volumetric_weight', 'chargeable_weight', 'freight', 'line_total',
+    'order_total', 'order_chargeable_weight', 'invalid'
+))
+
+
+def parse_rates(value):
+    """
+    Parses the per shipment type rates of PRICING_RATES, a comma-separated list of
+    ``shipment_type_id:base_fee:rate_per_kg`` entries, e.g. ``1:5:1.5,2:12:3``.
+
+    Args:
+        value (str): The setting.
+
+    Returns:
+        dict: (base fee, rate per kg) by shipment type ID.
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    rates = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        shipment_type_id, base_fee, rate_per_kg = entry.split(':')
+        rates[int(shipment_type_id)] = (float(base_fee), float(rate_per_kg))
+    return rates
+
+
+RATES = parse_rates(PRICING_RATES)
+
+
+def _column(values):
+    # One float64 array per field: None becomes NaN, and values that are not
+    # numbers (booleans included, which NumPy would take as 0 and 1) or too large
+    # for a float become -inf so that they fail validation
+    if bool not in set(map(type, values)):
+        try:
+            column = np.array(values, dtype=np.float64)
+            if column.ndim == 1:
+                return column
+        except (TypeError, ValueError, OverflowError):
+            pass
+    column = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        if type(value) is bool:
+            column[i] = -np.inf
+            continue
+        try:
+            column[i] = np.nan if value is None else float(value)
+        except (TypeError, ValueError, OverflowError):
+            column[i] = -np.inf
+    return column
+
+
+def _cents(amounts):
+    # Rounds half up; np.round rounds half to even. The epsilon absorbs the
+    # binary representation error of amounts such as 0.285.
+    return np.floor(amounts * 100 + 0.5 + 1e-9) / 100
+
+
+def _order_rates(shipment_type_ids):
+    base_fee = np.full(len(shipment_type_ids), PRICING_BASE_FEE)
+    rate_per_kg = np.full(len(shipment_type_ids), PRICING_RATE_PER_KG)
+    if RATES:
+        ids = np.array([-1 if value is None else value for value in shipment_type_ids], dtype=np.int64)
+        for shipment_type_id, (fee, rate) in RATES.items():
+            matches = ids == shipment_type_id
+            base_fee[matches] = fee
+            rate_per_kg[matches] = rate
+    return base_fee, rate_per_kg
+
+
+def price_orders(orders):
+    """
+    Prices a batch of orders at once, with one array operation per step over all
+    their items, so that a single order and a manifest of 100,000 items go through
+    the same code.
+
+    Weights are in kg and dimensions in cm. For every line:
+
+    * volumetric weight = length x width x height / PRICING_VOLUMETRIC_DIVISOR
+    * chargeable weight = max(weight, volumetric weight) x quantity
+    * freight = chargeable weight x rate per kg of the shipment type
+    * line total = price x quantity + freight, rounded to cents
+
+    The order total is the base fee of its shipment type plus its line totals. Rates
+    come from PRICING_RATES, or PRICING_BASE_FEE and PRICING_RATE_PER_KG for the
+    shipment types it doesn't list. Missing values count as 0 (1 for the quantity).
+    An item with a negative, non-numeric (boolean included) or out-of-range value,
+    a fractional quantity or one above MAX_QUANTITY, or amounts too large for a
+    float, makes its order invalid; invalid orders are priced at 0.
+
+    Args:
+        orders (list): (shipment_type_id, items) tuples, the items being dicts with
+            the ITEM_FIELDS keys.
+
+    Returns:
+        Quote: The per item and per order arrays.
+    """
+    order_count = len(orders)
+    counts = np.fromiter((len(items) for _, items in orders), dtype=np.intp, count=order_count)
+    order_index = np.repeat(np.arange(order_count), counts)
+    items = [item for _, order_items in orders for item in order_items]
+    columns = {}
+    bad = np.zeros(len(items), dtype=bool)
+    for field in ITEM_FIELDS:
+        column = _column([item.get(field) for item in items])
+        column[np.isnan(column)] = 1 if field == 'quantity' else 0
+        bad |= ~np.isfinite(column) | (column < 0)
+        columns[field] = column
+    quantity = columns['quantity']
+    bad |= quantity > MAX_QUANTITY
+    # Only the finite quantities: the remainder of infinity is NaN, with a warning
+    bad[~bad] |= quantity[~bad] % 1 != 0
+    for column in columns.values():
+        column[bad] = 0
+
+    base_fee, rate_per_kg = _order_rates([shipment_type_id for shipment_type_id, _ in orders])
+    # Finite but huge values can still overflow to infinity (or NaN, times a zero
+    # quantity): their items are invalid too
+    with np.errstate(over='ignore', invalid='ignore'):
+        volumetric_weight = columns['length'] * columns['width'] * columns['height'] / PRICING_VOLUMETRIC_DIVISOR
+        chargeable_weight = np.maximum(columns['weight'], volumetric_weight) * quantity
+        freight = _cents(chargeable_weight * rate_per_kg[order_index])
+        line_total = _cents(columns['price'] * quantity + freight)
+        overflow = ~np.isfinite(line_total)
+        bad |= overflow
+        for line in (volumetric_weight, chargeable_weight, freight, line_total):
+            line[overflow] = 0
+
+        invalid = np.bincount(order_index, weights=bad, minlength=order_count) > 0
+        order_total = _cents(base_fee + np.bincount(order_index, weights=line_total, minlength=order_count))
+        order_chargeable_weight = np.bincount(order_index, weights=chargeable_weight, minlength=order_count)
+    invalid |= ~np.isfinite(order_total) | ~np.isfinite(order_chargeable_weight)
+    order_total[invalid] = 0
+    order_chargeable_weight[invalid] = 0
+    return Quote(
+        order_index, volumetric_weight, chargeable_weight, freight, line_total,
+        order_total, order_chargeable_weight, invalid
+    )
+
+
+def totals_by_shipment_type(shipment_type_ids, quote):
+    """
+    Adds up the valid orders of a quote by shipment type.
+
+    Args:
+        shipment_type_ids (list): The shipment type ID of every order, as passed
+            to price_orders.
+        quote (Quote): The result of price_orders.
+
+    Returns:
+        list: One dict per shipment type, in ID order, with its number of orders,
+        chargeable weight and total amount.
+    """
+    valid = ~quote.invalid
+    ids = np.array([-1 if value is None else value for value in shipment_type_ids], dtype=np.int64)[valid]
+    types, inverse = np.unique(ids, return_inverse=True)
+    orders = np.bincount(inverse, minlength=len(types))
+    weights = np.bincount(inverse, weights=quote.order_chargeable_weight[valid], minlength=len(types)).round(3)
+    amounts = _cents(np.bincount(inverse, weights=quote.order_total[valid], minlength=len(types)))
+    return [
+        {
+            'shipment_type_id': None if shipment_type_id == -1 else shipment_type_id,
+            'orders': count,
+            'chargeable_weight': weight,
+            'total_amount': amount
+        }
+        for shipment_type_id, count, weight, amount in zip(
+            types.tolist(), orders.tolist(), weights.tolist(), amounts.tolist()
+        )
+    ]
@@ -5,21 +5,52 @@ from flask_jwt_extended import jwt_required
 # App
 from models import *
 from schemas import *
+from pagination import (
+    paginate,
+    pagination_params
+)
+from export import (
+    export_params,
+    stream_export
+)
+from serializer import serialize_with
+from permissions import permission_required
+from functions import (
+    create_orders_in_bulk,
+    iter_bulk_records,
+    quote_orders,
+    search_orders_by_sender_name
+)
+from pricing import (
+    INVALID_ITEMS,
+    price_orders
+)
 
 
 def register_routes(api):
     # Namespaces
-    ns_order = api.namespace('order', description='Order related operations')
-    ns_shipment = api.namespace('shipment-type', description='Shipment Type related operations')
+    ns_order = api.namespace('order', description='Order related operations', decorators=[permission_required('order')])
+    ns_shipment = api.namespace('shipment-type', description='Shipment Type related operations', decorators=[permission_required('shipment-type')])
 
     # Routes
     @ns_order.route('/')
     class OrderList(Resource):
         @jwt_required()
-        @api.marshal_list_with(order_schema)
+        @api.doc(params=pagination_params)
+        @serialize_with(order_schema, as_list=True)
         def get(self):
             """List all orders without items"""
-            return Order.query.all()
+            return paginate(Order.query.options(order_loader), Order.order_id)
+
+    @ns_order.route('/export')
+    class OrderExport(Resource):
+        @jwt_required()
+        @api.doc(params=export_params)
+        @api.produces(['application/x-ndjson', 'text/csv'])
+        def get(self):
+            """Export all orders with their items as NDJSON or CSV"""
+            statement = db.select(Order).options(order_loader).order_by(Order.order_id)
+            return stream_export(statement, order_schema, 'orders')
 
     @ns_order.route('/<int:id>')
     class OrderDetail(Resource):
@@ -27,7 +58,7 @@ def register_routes(api):
         @api.marshal_with(order_schema)
         def get(self, id):
             """Get an order by its ID with items"""
-            order = Order.query.get(id)
+            order = Order.query.options(order_loader).get(id)
             if not order:
                 ns_order.abort(404, "Order not found")
             return order
@@ -35,10 +66,15 @@ def register_routes(api):
     @ns_order.route('/search/<string:sender_name>')
     class OrderBySenderName(Resource):
         @jwt_required()
-        @api.marshal_list_with(order_schema)
+        @api.doc(params={
+            'mode': "'contains' (default, ranked by similarity) or 'prefix'",
+            **pagination_params
+        })
+        @serialize_with(order_schema, as_list=True)
         def get(self, sender_name):
             """Search orders by SenderName"""
-            return Order.query.filter(Order.sender_name.ilike(f'%{sender_name}%')).all()
+            mode = request.args.get('mode', 'contains')
+            return search_orders_by_sender_name(sender_name, mode)
 
     @ns_order.route('/create')
     class CreateOrder(Resource):
@@ -49,7 +85,17 @@ def register_routes(api):
         def post(self):
             """Create a new order with items"""
             data = request.json
-            order_items = data.pop('items', [])
+            shipment_type_id = data.get('shipment_type_id')
+            if shipment_type_id is not None and not shipment_type_reference.get(shipment_type_id):
+                ns_order.abort(400, "Shipment type not found")
+            order_items = data.pop('items', None) or []
+            if not isinstance(order_items, list) or not all(isinstance(item, dict) for item in order_items):
+                ns_order.abort(400, "items must be a list of objects")
+            # The total is computed here, whatever the client sent
+            quote = price_orders([(shipment_type_id, order_items)])
+            if quote.invalid[0]:
+                ns_order.abort(400, INVALID_ITEMS)
+            data['total_amount'] = quote.order_total.item(0)
             new_order = Order(**data)
             for item_data in order_items:
                 new_item = OrderItem(**item_data)
@@ -58,14 +104,49 @@ def register_routes(api):
             db.session.commit()
             return new_order, 201
 
+    @ns_order.route('/bulk')
+    class CreateOrderBulk(Resource):
+        @jwt_required()
+        @api.doc('create_orders_in_bulk', description=(
+            'Accepts a JSON array of orders, or an NDJSON stream with '
+            'Content-Type: application/x-ndjson. Returns 201 if every order was '
+            'created, 207 otherwise.'
+        ))
+        @api.expect([order_schema_input])
+        @api.marshal_with(bulk_order_response_schema, code=201)
+        def post(self):
+            """Create orders with items in bulk"""
+            result = create_orders_in_bulk(iter_bulk_records())
+            return result, 201 if result['failed'] == 0 else 207
+
+    @ns_order.route('/quote')
+    class OrderQuote(Resource):
+        @jwt_required()
+        @api.doc('quote_orders', description=(
+            'Prices a manifest of orders (same shape as /order/create) without creating '
+            'them: total, chargeable weight and breakdown per item of every order, and '
+            'totals by shipment type. Accepts a JSON array or an NDJSON stream with '
+            'Content-Type: application/x-ndjson. Returns 200 if every order was quoted, '
+            '207 otherwise.'
+        ))
+        @api.expect([order_schema_input])
+        @api.response(200, 'Success', quote_response_schema)
+        def post(self):
+            """Quote orders in bulk"""
+            # Built as plain lists and dicts: marshalling a large manifest would
+            # cost more than pricing it
+            result = quote_orders(iter_bulk_records())
+            return result, 200 if result['failed'] == 0 else 207
+
     
     @ns_shipment.route('/')
     class ShipmentTypeCreate(Resource):
         @jwt_required()
-        @api.marshal_list_with(shipment_type_schema)
+        @api.response(200, 'Success', [shipment_type_schema])
+        @api.response(304, 'Not modified')
         def get(self):
             """List all shipment types"""
-            return ShipmentType.query.all()
+            return shipment_type_reference.response()
         
         @jwt_required()
         @api.doc('Create_Shipment_Type')
@@ -82,6 +163,7 @@ def register_routes(api):
             )
             db.session.add(new_shipment_type)
             db.session.commit()
+            shipment_type_reference.bump()
             return new_shipment_type
         
 
@@ -91,7 +173,7 @@ def register_routes(api):
         @api.marshal_with(shipment_type_schema)
         def get(self, shipment_type_id):
             """Retrieve a specific shipment status"""
-            shipment_type = ShipmentType.query.get(shipment_type_id)
+            shipment_type = shipment_type_reference.get(shipment_type_id)
             if not shipment_type:
                 ns_order.abort(404, "Shipment type not found")
-            return ShipmentType.query.filter_by(shipment_type_id=shipment_type_id).first()
\ No newline at end of file
+            return shipment_type
\ No newline at end of file
@@ -0,0 +1,236 @@
+# Flask
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+# SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+# Python
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+# App
+from constants import (
+    REPLICA_LAG_CHECK_INTERVAL,
+    REPLICA_MAX_LAG,
+    REPLICA_STATE_DIR
+)
+
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+# Slots of the recent writer table: a power of two well above the number of
+# clients writing within REPLICA_MAX_LAG seconds
+RECENT_WRITER_SLOTS = 4096
+_DEADLINE = struct.Struct('<d')
+
+_REPLICA_LAG_SQL = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+class ReplicaMonitor:
+    """
+    Tracks the replication lag of the replica, checked at most once every
+    REPLICA_LAG_CHECK_INTERVAL seconds per process.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_at = None
+        self.lag = None
+        self.healthy = False
+
+    def _check(self, engine):
+        try:
+            with engine.connect() as conn:
+                # Not a streaming replica (e.g. a local stand-in): no lag to measure
+                if engine.dialect.name != 'postgresql':
+                    return 0.0
+                return float(conn.execute(_REPLICA_LAG_SQL).scalar() or 0.0)
+        except DBAPIError:
+            return None
+
+    def available(self, engine):
+        """
+        Args:
+            engine: The replica engine.
+
+        Returns:
+            bool: True if the replica is reachable and at most REPLICA_MAX_LAG
+            seconds behind the primary.
+        """
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= REPLICA_LAG_CHECK_INTERVAL:
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.lag = self._check(engine)
+                    self.healthy = self.lag is not None and self.lag <= REPLICA_MAX_LAG
+                    self.checked_at = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self.healthy
+
+    def stats(self):
+        return {'lag': self.lag, 'healthy': self.healthy, 'max_lag': REPLICA_MAX_LAG}
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class RecentWriters:
+    """
+    Remembers, per JWT identity, until when the reads of a client must go to the
+    primary after it wrote (read-your-writes). Scanners and API clients send a bearer
+    token but keep no cookies, so the deadline is kept server side.
+
+    The deadlines are wall-clock times in a memory-mapped file of RECENT_WRITER_SLOTS
+    doubles (under REPLICA_STATE_DIR, /dev/shm by default), shared by all the workers
+    of a container. An identity maps to a slot through a hash of it; identities
+    sharing a slot only cost each other a few primary reads. Entries need no cleanup:
+    a deadline in the past is the same as no entry. Behind a load balancer spreading
+    one client over several containers, the others don't see its writes.
+    """
+    def __init__(self, slots):
+        self._slots = slots
+        self._lock = threading.Lock()
+        self._path = None
+        self._pid = None
+        self._deadlines = None
+
+    def configure(self, database_url):
+        """
+        Names the file after the database, so that apps pointed at different
+        databases never share the table.
+
+        Args:
+            database_url (str): The URL of the primary database.
+        """
+        directory = REPLICA_STATE_DIR if os.path.isdir(REPLICA_STATE_DIR) else tempfile.gettempdir()
+        name = hashlib.sha256(database_url.encode()).hexdigest()[:12]
+        self._path = os.path.join(directory, f'recent-writers-{name}')
+        self._pid = None
+
+    def _ensure_open(self):
+        # Mappings are not shared with the parent process after a fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    size = self._slots * _DEADLINE.size
+                    fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        if os.fstat(fd).st_size < size:
+                            os.ftruncate(fd, size)
+                        self._deadlines = mmap.mmap(fd, size)
+                    finally:
+                        os.close(fd)
+                    self._pid = os.getpid()
+
+    def _offset(self, identity):
+        digest = hashlib.blake2b(str(identity).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self._slots * _DEADLINE.size
+
+    def remember(self, identity, until):
+        """
+        Sends the reads of an identity to the primary until the given time.
+
+        Args:
+            identity: The JWT identity of the client that wrote.
+            until (float): Epoch seconds.
+        """
+        self._ensure_open()
+        offset = self._offset(identity)
+        if _DEADLINE.unpack_from(self._deadlines, offset)[0] < until:
+            _DEADLINE.pack_into(self._deadlines, offset, until)
+
+    def until(self, identity):
+        """
+        Args:
+            identity: A JWT identity.
+
+        Returns:
+            float: Epoch seconds until which the identity reads from the primary.
+        """
+        self._ensure_open()
+        return _DEADLINE.unpack_from(self._deadlines, self._offset(identity))[0]
+
+
+recent_writers = RecentWriters(RECENT_WRITER_SLOTS)
+
+
+def _jwt_identity():
+    # Before the access token is verified there is no identity to go by
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def use_replica():
+    """
+    Decides whether the reads of the current request can go to the replica: only for
+    read-only requests, outside ``primary()`` blocks, and when the caller has not
+    written in the last REPLICA_MAX_LAG seconds (read-your-writes). Requests without
+    an access token go to the replica.
+
+    Returns:
+        bool: True if the request may read from the replica.
+    """
+    if not has_request_context() or request.method not in READ_METHODS or g.get('use_primary'):
+        return False
+    identity = _jwt_identity()
+    return identity is None or recent_writers.until(identity) <= time.time()
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of GET requests to the ``replica`` bind, when it is
+    configured, reachable and at most REPLICA_MAX_LAG seconds behind, and everything
+    else (writes, flushes, other requests) to the primary.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing:
+            return engine
+        engines = self._db.engines
+        replica = engines.get('replica')
+        if replica is None or engine is not engines.get(None) or not use_replica():
+            return engine
+        return replica if replica_monitor.available(replica) else engine
+
+
+@contextmanager
+def primary():
+    """Runs the enclosed reads on the primary, e.g. right after a write."""
+    previous = g.get('use_primary', False)
+    g.use_primary = True
+    try:
+        yield
+    finally:
+        g.use_primary = previous
+
+
+def remember_write(response):
+    # After a successful write, keep the caller on the primary for as long as the
+    # replica may lag behind
+    if request.method not in READ_METHODS and response.status_code < 400:
+        identity = _jwt_identity()
+        if identity is not None:
+            recent_writers.remember(identity, time.time() + REPLICA_MAX_LAG)
+    return response
+
+
+def init_routing(app):
+    """
+    Registers the read-your-writes hook when a replica is configured.
+
+    Args:
+        app: The Flask app.
+    """
+    if 'replica' in app.config.get('SQLALCHEMY_BINDS', {}):
+        recent_writers.configure(app.config['SQLALCHEMY_DATABASE_URI'])
+        app.after_request(remember_write)
@@ -1,5 +1,9 @@
 from flask_restx import fields
+from sqlalchemy.orm import selectinload
 from __init__ import api
+from models import Order, ShipmentType
+from reference import ReferenceData
+from serializer import serialize
 
 order_item_schema = api.model('Order_Item', {
     'order_item_id': fields.Integer(description='Order Item ID'),
@@ -36,6 +40,9 @@ order_schema = api.model('Order', {
     'items': fields.List(fields.Nested(order_item_schema))
 })
 
+# Relationships serialized by order_schema, loaded up front to avoid N+1 queries
+order_loader = selectinload(Order.items)
+
 order_schema_input = api.model('Order', {    
     'sender_id': fields.Integer(description='Sender ID'),
     'sender_address': fields.String(description='Sender Address'),
@@ -45,7 +52,7 @@ order_schema_input = api.model('Order', {
     'receiver_address': fields.String(description='Receiver Address'),
     'receiver_phone': fields.String(description='Receiver Phone'),
     'order_date': fields.DateTime(description='Order Date'),
-    'total_amount': fields.Float(description='Total Amount'),
+    'total_amount': fields.Float(description='Ignored, the total is computed from the items'),
     'shipment_type_id': fields.Integer(description='Shipment Type ID'),
     'items': fields.List(fields.Nested(order_item_schema_input))
 })
@@ -62,3 +69,54 @@ shipment_type_schema_input = api.model('Shipment_Type', {
     'shipment_type_name': fields.String(description='Shipment Type Name'),
     'description': fields.String(description='Description')
 })
+
+
+bulk_order_result_schema = api.model('Bulk_Order_Result', {
+    'index': fields.Integer(description='Position of the order in the request'),
+    'status': fields.String(description="'created' or 'error'"),
+    'order_id': fields.Integer(description='Order ID, if created'),
+    'error': fields.String(description='Reason the order was rejected')
+})
+
+bulk_order_response_schema = api.model('Bulk_Order_Response', {
+    'created': fields.Integer(description='Number of orders created'),
+    'failed': fields.Integer(description='Number of orders rejected'),
+    'results': fields.List(fields.Nested(bulk_order_result_schema))
+})
+
+quote_item_schema = api.model('Quote_Item', {
+    'volumetric_weight': fields.Float(description='Volumetric weight of one unit (kg)'),
+    'chargeable_weight': fields.Float(description='Chargeable weight of the line (kg)'),
+    'freight': fields.Float(description='Freight of the line'),
+    'line_total': fields.Float(description='Price times quantity plus freight')
+})
+
+quote_result_schema = api.model('Quote_Result', {
+    'index': fields.Integer(description='Position of the order in the request'),
+    'status': fields.String(description="'quoted' or 'error'"),
+    'total_amount': fields.Float(description='Order total, if quoted'),
+    'chargeable_weight': fields.Float(description='Chargeable weight of the order (kg), if quoted'),
+    'items': fields.List(fields.Nested(quote_item_schema), description='Breakdown per item, if quoted'),
+    'error': fields.String(description='Reason the order was rejected')
+})
+
+quote_total_schema = api.model('Quote_Total', {
+    'shipment_type_id': fields.Integer(description='Shipment Type ID'),
+    'orders': fields.Integer(description='Number of quoted orders'),
+    'chargeable_weight': fields.Float(description='Chargeable weight (kg)'),
+    'total_amount': fields.Float(description='Sum of the order totals')
+})
+
+quote_response_schema = api.model('Quote_Response', {
+    'quoted': fields.Integer(description='Number of orders quoted'),
+    'failed': fields.Integer(description='Number of orders rejected'),
+    'results': fields.List(fields.Nested(quote_result_schema)),
+    'totals': fields.List(fields.Nested(quote_total_schema), description='Quoted orders by shipment type')
+})
+
+# Cached GET /shipment-type/ response, bumped when a shipment type is created
+shipment_type_reference = ReferenceData(
+    'shipment_types',
+    lambda: serialize(ShipmentType.query.all(), shipment_type_schema),
+    key='shipment_type_id'
+)
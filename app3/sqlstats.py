@@ -0,0 +1,93 @@
+# Flask
+from flask import g, has_request_context, request
+# SQLAlchemy
+from sqlalchemy import event
+# Python
+import logging
+from time import perf_counter
+# App
+from constants import (
+    SQL_DEBUG_HEADERS,
+    SQL_N_PLUS_ONE_THRESHOLD,
+    SQL_SLOW_QUERY_MS
+)
+
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+QUERY_TIME_HEADER = 'X-Query-Time'
+
+
+def _route():
+    rule = request.url_rule
+    return f'{request.method} {rule.rule if rule is not None else request.path}'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context._query_start
+    in_request = has_request_context()
+    if in_request:
+        request_globals = g._get_current_object()
+        request_globals._sql_queries = request_globals.get('_sql_queries', 0) + 1
+        request_globals._sql_time = request_globals.get('_sql_time', 0.0) + elapsed
+        # Only single statements: an executemany is one round trip by design
+        if SQL_N_PLUS_ONE_THRESHOLD and not executemany:
+            statements = request_globals.get('_sql_statements')
+            if statements is None:
+                statements = request_globals._sql_statements = {}
+            statements[statement] = statements.get(statement, 0) + 1
+    if SQL_SLOW_QUERY_MS and elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            elapsed * 1000, _route() if in_request else 'no request', statement
+        )
+
+
+def query_stats():
+    """
+    Returns:
+        tuple: The number of queries run by the current request and their total time
+        in seconds.
+    """
+    request_globals = g._get_current_object()
+    return request_globals.get('_sql_queries', 0), request_globals.get('_sql_time', 0.0)
+
+
+def report_request(response):
+    # Flags statements repeated within the request (lazy loads in a loop) and adds the
+    # query count and time to the response
+    statements = g.pop('_sql_statements', None)
+    if statements:
+        for statement, count in statements.items():
+            if count >= SQL_N_PLUS_ONE_THRESHOLD:
+                logger.warning(
+                    "Possible N+1 on %s: the same statement ran %d times: %s",
+                    _route(), count, statement
+                )
+    if SQL_DEBUG_HEADERS:
+        queries, sql_time = query_stats()
+        response.headers[QUERY_COUNT_HEADER] = str(queries)
+        response.headers[QUERY_TIME_HEADER] = f'{sql_time * 1000:.2f}ms'
+    return response
+
+
+def init_sqlstats(app, db):
+    """
+    Registers the query timers on every engine (primary and replica) and the hook
+    that reports the queries of each request.
+
+    Args:
+        app: The Flask app.
+        db: The SQLAlchemy extension, already initialized on the app.
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.after_request(report_request)
@@ -1,7 +1,6 @@
 # Flask
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.schema import CreateSchema
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_restx import Api
@@ -14,8 +13,20 @@ from constants import (
     POSTGRES_PASSWORD,
     POSTGRES_HOST,
     POSTGRES_PORT,
-    POSTGRES_DB
+    POSTGRES_DB,
+    POSTGRES_REPLICA_HOST,
+    POSTGRES_REPLICA_PORT,
+    DATABASE_URL
 )
+from db_pool import (
+    engine_options,
+    init_pool
+)
+from routing import (
+    RoutingSession,
+    init_routing
+)
+from sqlstats import init_sqlstats
 
 authorizations = {
     'Bearer Auth': {
@@ -26,7 +37,7 @@ authorizations = {
     }
 }
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 jwt = JWTManager()
 api = Api(version='1.0', title='XDel API',
@@ -39,22 +50,30 @@ def create_app():
     app.config['SECRET_KEY'] = SECRET_KEY
     app.config['JWT_SECRET_KEY'] = JWT_SECRET_KEY
     app.config['ENV']='development'
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL or f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    if POSTGRES_REPLICA_HOST:
+        replica_uri = f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_REPLICA_HOST}:{POSTGRES_REPLICA_PORT}/{POSTGRES_DB}'
+        app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': replica_uri, **engine_options(replica_uri)}}
     app.config['ERROR_404_HELP'] = False
     app.config['DEBUG'] = True if ENV == 'development' else False
     
     db.init_app(app)
+    init_pool(app, db)
+    init_routing(app)
+    init_sqlstats(app, db)
     bcrypt.init_app(app)
     jwt.init_app(app)
     api.init_app(app)
 
     from routes import register_routes
     register_routes(api)
+    from audit import audit_logger
+    audit_logger.init_app(app)
+    from metrics import request_metrics
+    request_metrics.init_app(app)
+    from commands import register_commands
+    register_commands(app)
 
-    with app.app_context():
-        with db.engine.connect() as conn:
-            conn.execute(CreateSchema("shipment_schema", if_not_exists=True))
-            conn.commit()
-        db.create_all()
     return app
\ No newline at end of file
@@ -0,0 +1,138 @@
+# Flask
+import click
+# SQLAlchemy
+from sqlalchemy.schema import CreateIndex, CreateSchema
+# Python
+import subprocess
+# App
+from __init__ import db
+from constants import (
+    PARTITION_ARCHIVE_DIR,
+    PARTITION_MONTHS_AHEAD,
+    PARTITION_RETENTION_MONTHS
+)
+from functions import prepare_tracking_number_index
+from partitions import (
+    archive_partition,
+    attach_partitions,
+    create_partitions,
+    detached_partitions,
+    expired_partitions,
+    is_postgresql,
+    migrate_table,
+    partitioned_tables,
+    table_kind
+)
+
+
+def init_db():
+    """
+    Creates the database schema of the app with its tables and indexes. Every
+    statement is idempotent, so it is safe to run on every deployment. On
+    PostgreSQL, the upcoming partitions of the partitioned tables are created too.
+    """
+    schemas = {table.schema for table in db.metadata.sorted_tables if table.schema}
+    with db.engine.connect() as conn:
+        for schema in sorted(schemas):
+            conn.execute(CreateSchema(schema, if_not_exists=True))
+        conn.commit()
+    db.create_all()
+    with db.engine.connect() as conn:
+        prepared = prepare_tracking_number_index(conn)
+        if prepared is not None and any(prepared):
+            click.echo('Normalized %d tracking numbers, renamed %d duplicates' % prepared)
+        # create_all skips indexes of tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        conn.commit()
+    if is_postgresql():
+        for table in partitioned_tables():
+            with db.engine.connect() as conn:
+                kind = table_kind(conn, table)
+            if kind == 'partitioned':
+                create_partitions(table)
+            else:
+                click.echo(
+                    f'{table.schema}.{table.name} is not partitioned, '
+                    'convert it with `flask --app wsgi partitions migrate`'
+                )
+
+
+def register_commands(app):
+    """
+    Registers the CLI commands of the app, run with ``flask --app wsgi <command>``.
+
+    Args:
+        app: The Flask app.
+    """
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema, tables and indexes."""
+        init_db()
+        click.echo('Database initialized')
+
+    @app.cli.group('partitions')
+    def partitions_group():
+        """Manage the monthly partitions of the time-series tables (PostgreSQL)."""
+        if not is_postgresql():
+            raise click.ClickException('Partitioning needs PostgreSQL')
+
+    @partitions_group.command('create')
+    @click.option('--months-ahead', default=PARTITION_MONTHS_AHEAD, show_default=True,
+                  help='Months past the current one to prepare.')
+    def create_partitions_command(months_ahead):
+        """Create the upcoming monthly partitions. Run it daily."""
+        for table in partitioned_tables():
+            for name in attach_partitions(table):
+                click.echo(f'Attached back {table.schema}.{name}')
+            for name in create_partitions(table, months_ahead):
+                click.echo(f'Created {table.schema}.{name}')
+
+    @partitions_group.command('migrate')
+    @click.option('--months-ahead', default=PARTITION_MONTHS_AHEAD, show_default=True,
+                  help='Months past the current one to prepare.')
+    def migrate_partitions_command(months_ahead):
+        """Convert existing plain tables into partitioned ones."""
+        for table in partitioned_tables():
+            with db.engine.connect() as conn:
+                kind = table_kind(conn, table)
+            if kind != 'plain':
+                click.echo(f'{table.schema}.{table.name} is already partitioned or missing, skipped')
+                continue
+            try:
+                moved = migrate_table(table, months_ahead)
+            except ValueError as error:
+                raise click.ClickException(str(error))
+            click.echo(f'Partitioned {table.schema}.{table.name} ({moved} rows)')
+
+    @partitions_group.command('retain')
+    @click.option('--retention-months', default=PARTITION_RETENTION_MONTHS, show_default=True,
+                  help='Months of rows to keep besides the current one.')
+    @click.option('--archive-dir', default=PARTITION_ARCHIVE_DIR, show_default=True,
+                  type=click.Path(file_okay=False), help='Directory of the dump files.')
+    @click.option('--dry-run', is_flag=True, help='Only list the partitions to archive.')
+    def retain_partitions_command(retention_months, archive_dir, dry_run):
+        """Archive the partitions older than the retention period to compressed dumps and drop them."""
+        for table in partitioned_tables():
+            # Partitions left detached by an interrupted run are attached back, and
+            # archived again below if expired
+            if dry_run:
+                with db.engine.connect() as conn:
+                    for name, _, _ in detached_partitions(conn, table):
+                        click.echo(f'Would attach back {table.schema}.{name}')
+            else:
+                for name in attach_partitions(table):
+                    click.echo(f'Attached back {table.schema}.{name}')
+            for partition in expired_partitions(table, retention_months):
+                name = partition[0]
+                if dry_run:
+                    click.echo(f'Would archive {table.schema}.{name}')
+                    continue
+                try:
+                    path = archive_partition(table, partition, archive_dir)
+                except FileNotFoundError:
+                    raise click.ClickException('pg_dump not found, install the PostgreSQL client')
+                except subprocess.CalledProcessError as error:
+                    raise click.ClickException(f'pg_dump failed for {name}: {error.stderr.strip()}')
+                click.echo(f'Archived {table.schema}.{name} to {path}')
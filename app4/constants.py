@@ -8,4 +8,41 @@ POSTGRES_USER = os.environ.get("POSTGRES_USER", None)
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", None)
 POSTGRES_HOST = os.environ.get("POSTGRES_HOST", None)
 POSTGRES_PORT = os.environ.get("POSTGRES_PORT", None)
-POSTGRES_DB = os.environ.get("POSTGRES_DB", None)
\ No newline at end of file
+POSTGRES_DB = os.environ.get("POSTGRES_DB", None)
+PAGE_SIZE_DEFAULT = int(os.environ.get("PAGE_SIZE_DEFAULT", 100))
+PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", 1000))
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+RBAC_ENABLED = os.environ.get("RBAC_ENABLED", "false").lower() == "true"
+RBAC_REFRESH_INTERVAL = int(os.environ.get("RBAC_REFRESH_INTERVAL", 60))
+AUDIT_LOG_ENABLED = os.environ.get("AUDIT_LOG_ENABLED", "false").lower() == "true"
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get("AUDIT_LOG_QUEUE_SIZE", 10000))
+AUDIT_LOG_BATCH_SIZE = int(os.environ.get("AUDIT_LOG_BATCH_SIZE", 500))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get("AUDIT_LOG_FLUSH_INTERVAL", 1))
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", 1000))
+BULK_MAX_RECORDS = int(os.environ.get("BULK_MAX_RECORDS", 50000))
+REFERENCE_CACHE_TTL = int(os.environ.get("REFERENCE_CACHE_TTL", 30))
+REFERENCE_MAX_AGE = int(os.environ.get("REFERENCE_MAX_AGE", 60))
+REFERENCE_CACHE_DIR = os.environ.get("REFERENCE_CACHE_DIR", "/dev/shm")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 300))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 30000))
+DB_PGBOUNCER_MODE = os.environ.get("DB_PGBOUNCER_MODE", "false").lower() == "true"
+POSTGRES_REPLICA_HOST = os.environ.get("POSTGRES_REPLICA_HOST", None)
+POSTGRES_REPLICA_PORT = os.environ.get("POSTGRES_REPLICA_PORT", POSTGRES_PORT)
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", 2))
+REPLICA_STATE_DIR = os.environ.get("REPLICA_STATE_DIR", "/dev/shm")
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", 5))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+SQL_SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", 200))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", 5 if ENV == "development" else 0))
+SQL_DEBUG_HEADERS = os.environ.get("SQL_DEBUG_HEADERS", "true" if ENV == "development" else "false").lower() == "true"
+DATABASE_URL = os.environ.get("DATABASE_URL", None)
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", 3))
+PARTITION_RETENTION_MONTHS = int(os.environ.get("PARTITION_RETENTION_MONTHS", 24))
+PARTITION_ARCHIVE_DIR = os.environ.get("PARTITION_ARCHIVE_DIR", "archive")
\ No newline at end of file
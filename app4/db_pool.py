@@ -0,0 +1,138 @@
+# Flask
+from flask_jwt_extended import jwt_required
+# SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+# Python
+import threading
+import time
+# App
+from constants import (
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER_MODE,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT
+)
+from routing import replica_monitor
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait for a free connection.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def engine_options(database_uri):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings.
+
+    In PgBouncer mode (transaction pooling) connections are not pooled by the app,
+    since PgBouncer does it, and no startup options are sent; the statement timeout
+    is set per transaction by init_pool instead. psycopg2 never uses server-side
+    prepared statements, so no session state outlives a transaction.
+
+    Args:
+        database_uri (str): The SQLALCHEMY_DATABASE_URI of the app.
+
+    Returns:
+        dict: The engine options.
+    """
+    if DB_PGBOUNCER_MODE:
+        return {'poolclass': NullPool}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
+    if DB_STATEMENT_TIMEOUT and database_uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'}
+    return options
+
+
+def _set_local_statement_timeout(conn):
+    conn.exec_driver_sql(f'SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT}')
+
+
+def pool_stats(engine):
+    """
+    Returns:
+        dict: The size, checked out and overflow connections of the engine's pool and
+        the number, total and maximum wait time (in seconds) of checkouts.
+    """
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            'checkouts': pool.checkouts,
+            'timeouts': pool.timeouts,
+            'wait_total': round(pool.wait_total, 6),
+            'wait_max': round(pool.wait_max, 6)
+        })
+    return stats
+
+
+def all_pool_stats(db):
+    """
+    Returns:
+        dict: The pool_stats of the primary, with those of the replica and its
+        replication lag under 'replica' when one is configured.
+    """
+    stats = pool_stats(db.engine)
+    replica = db.engines.get('replica')
+    if replica is not None:
+        stats['replica'] = {**pool_stats(replica), **replica_monitor.stats()}
+    return stats
+
+
+def init_pool(app, db):
+    """
+    Sets the statement timeout per transaction in PgBouncer mode (on the replica
+    too) and registers the /db/pool statistics endpoint, which requires an access token.
+
+    Args:
+        app: The Flask app.
+        db: The SQLAlchemy extension, already initialized on the app.
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if DB_PGBOUNCER_MODE and DB_STATEMENT_TIMEOUT and engine.dialect.name == 'postgresql':
+            event.listen(engine, 'begin', _set_local_statement_timeout)
+    app.add_url_rule('/db/pool', 'db_pool_stats', jwt_required()(lambda: all_pool_stats(db)))
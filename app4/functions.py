@@ -0,0 +1,329 @@
+# Flask
+from flask_restx import abort
+# SQLAlchemy
+from sqlalchemy import bindparam, case, cast, func, insert, inspect, select, update
+from sqlalchemy.exc import DBAPIError
+# Python
+from datetime import datetime
+# App
+from __init__ import db
+from constants import (
+    BULK_CHUNK_SIZE,
+    BULK_MAX_RECORDS
+)
+from models import Event, Shipment, normalize_tracking_number
+from schemas import shipment_status_reference
+
+
+DELIVERED_STATUS_ID = 4
+TIMELINE_FORMATS = ('full', 'compact')
+
+
+def prepare_tracking_number_index(conn):
+    """
+    Normalizes the stored tracking numbers and renames duplicates, so that the unique
+    index on Shipment.tracking_number can be created. Only runs while the index
+    doesn't exist: rows written after that are normalized by the model.
+
+    Of the shipments sharing a tracking number, the oldest keeps it and the others
+    get a ``-DUP<shipment_id>`` suffix, so that no row is lost.
+
+    Args:
+        conn: An open SQLAlchemy connection used for schema setup.
+
+    Returns:
+        tuple: The number of tracking numbers normalized and renamed, or None if the
+        index already exists.
+    """
+    table = Shipment.__table__
+    (index,) = (index for index in table.indexes if index.columns.keys() == ['tracking_number'])
+    existing = {found['name'] for found in inspect(conn).get_indexes(table.name, schema=table.schema)}
+    if index.name in existing:
+        return None
+    tracking_number = table.c.tracking_number
+    if conn.dialect.name == 'postgresql':
+        normalized = func.upper(func.regexp_replace(tracking_number, r'\s', '', 'g'))
+        changed = conn.execute(
+            update(table).where(tracking_number != normalized).values(tracking_number=normalized)
+        ).rowcount
+    else:
+        rows = conn.execute(select(table.c.shipment_id, tracking_number).where(tracking_number.is_not(None))).all()
+        updates = [
+            {'id': shipment_id, 'value': normalize_tracking_number(value)}
+            for shipment_id, value in rows if normalize_tracking_number(value) != value
+        ]
+        if updates:
+            conn.execute(
+                update(table).where(table.c.shipment_id == bindparam('id')).values(tracking_number=bindparam('value')),
+                updates
+            )
+        changed = len(updates)
+    ranked = select(
+        table.c.shipment_id,
+        func.row_number().over(partition_by=tracking_number, order_by=table.c.shipment_id).label('rank')
+    ).where(tracking_number.is_not(None)).subquery()
+    duplicates = select(ranked.c.shipment_id).where(ranked.c.rank > 1)
+    renamed = conn.execute(
+        update(table)
+        .where(table.c.shipment_id.in_(duplicates))
+        .values(tracking_number=tracking_number + '-DUP' + cast(table.c.shipment_id, db.String))
+    ).rowcount
+    return changed, renamed
+
+
+def parse_event_record(record, now):
+    """
+    Validates one scan of a batch upload and turns it into an Event row.
+
+    Args:
+        record: The decoded scan.
+        now (datetime): The event date used when the scan doesn't carry one.
+
+    Returns:
+        dict: The Event row, ready for a multi-row INSERT.
+
+    Raises:
+        ValueError: If the record is not a valid scan.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Event must be a JSON object")
+    shipment_id = record.get('shipment_id')
+    shipment_status_id = record.get('shipment_status_id')
+    # bool is a subclass of int, but true is not a valid ID
+    if type(shipment_id) is not int or type(shipment_status_id) is not int:
+        raise ValueError("shipment_id and shipment_status_id must be integers")
+    if not shipment_status_reference.get(shipment_status_id):
+        raise ValueError("Shipment status not found")
+    comment = record.get('comment')
+    if comment is not None and not isinstance(comment, str):
+        raise ValueError("comment must be a string")
+    event_date = record.get('event_date')
+    if event_date is not None and not isinstance(event_date, str):
+        raise ValueError("event_date must be an ISO 8601 string")
+    if event_date:
+        event_date = datetime.fromisoformat(event_date)
+        if event_date.tzinfo is not None:
+            # Dates are stored as naive local times
+            event_date = event_date.astimezone().replace(tzinfo=None)
+    return {
+        'shipment_id': shipment_id,
+        'shipment_status_id': shipment_status_id,
+        'event_date': event_date or now,
+        'comment': comment
+    }
+
+
+def apply_latest_status(rows):
+    """
+    Sets each shipment's status to the one of its latest event in a single UPDATE,
+    along with actual_delivery_date when that status is Delivered. Shipments that
+    already have a later stored event keep their status, so that a late scan doesn't
+    roll them back.
+
+    Args:
+        rows (list): Event rows, in ascending event_date order.
+    """
+    latest = {row['shipment_id']: row for row in rows}
+    newer_event = select(Event.event_id).where(
+        Event.shipment_id == Shipment.shipment_id,
+        Event.event_date > case(
+            {shipment_id: row['event_date'] for shipment_id, row in latest.items()},
+            value=Shipment.shipment_id
+        )
+    ).exists()
+    values = {
+        'shipment_status_id': case(
+            {shipment_id: row['shipment_status_id'] for shipment_id, row in latest.items()},
+            value=Shipment.shipment_id
+        )
+    }
+    delivered = {
+        shipment_id: row['event_date']
+        for shipment_id, row in latest.items()
+        if row['shipment_status_id'] == DELIVERED_STATUS_ID
+    }
+    if delivered:
+        values['actual_delivery_date'] = case(
+            delivered,
+            value=Shipment.shipment_id,
+            else_=Shipment.actual_delivery_date
+        )
+    db.session.execute(
+        update(Shipment)
+        .where(Shipment.shipment_id.in_(latest), ~newer_event)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def insert_events(rows):
+    """
+    Inserts a chunk of events with one multi-row INSERT and updates the status of
+    their shipments, inside the current transaction.
+
+    Args:
+        rows (list): Event rows as returned by parse_event_record, in ascending
+            event_date order.
+
+    Returns:
+        list: The generated event IDs, in the same order as the input.
+    """
+    event_ids = db.session.execute(
+        insert(Event).returning(Event.event_id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    apply_latest_status(rows)
+    return event_ids
+
+
+def create_events_in_bulk(records):
+    """
+    Registers a batch of scans. The referenced shipments are validated with one
+    query, then events are inserted with multi-row INSERTs and shipment statuses
+    updated set-wise, committing once per chunk of BULK_CHUNK_SIZE events. If the
+    database rejects a chunk, it is rolled back and its events retried one by one
+    so that only the offending scans fail; the chunks committed before it are kept.
+
+    Args:
+        records (list): The decoded scans.
+
+    Returns:
+        dict: The number of created and failed events and a result per record
+        with its index in the request and either its event_id or an error.
+    """
+    if not isinstance(records, list):
+        abort(400, "Request body must be a JSON array")
+    if len(records) > BULK_MAX_RECORDS:
+        abort(413, f"A batch can contain at most {BULK_MAX_RECORDS} records")
+    now = datetime.now()
+    results = []
+    valid = []
+    for index, record in enumerate(records):
+        try:
+            valid.append((index, parse_event_record(record, now)))
+        except (ValueError, TypeError) as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+
+    shipment_ids = {row['shipment_id'] for _, row in valid}
+    existing = set(db.session.execute(
+        select(Shipment.shipment_id).where(Shipment.shipment_id.in_(shipment_ids))
+    ).scalars()) if shipment_ids else set()
+    for index, row in valid:
+        if row['shipment_id'] not in existing:
+            results.append({'index': index, 'status': 'error', 'error': "Shipment not found"})
+    valid = [(index, row) for index, row in valid if row['shipment_id'] in existing]
+
+    # Scans uploaded after a reconnect may be out of order; apply them oldest first
+    # so that each shipment ends with the status of its latest scan.
+    valid.sort(key=lambda pair: pair[1]['event_date'])
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start:start + BULK_CHUNK_SIZE]
+        try:
+            event_ids = insert_events([row for _, row in chunk])
+            db.session.commit()
+        except DBAPIError:
+            db.session.rollback()
+            for index, row in chunk:
+                try:
+                    event_id, = insert_events([row])
+                    db.session.commit()
+                except DBAPIError as error:
+                    db.session.rollback()
+                    results.append({'index': index, 'status': 'error', 'error': str(error.orig)})
+                else:
+                    results.append({'index': index, 'status': 'created', 'event_id': event_id})
+        else:
+            for (index, _), event_id in zip(chunk, event_ids):
+                results.append({'index': index, 'status': 'created', 'event_id': event_id})
+    results.sort(key=lambda result: result['index'])
+    created = sum(1 for result in results if result['status'] == 'created')
+    return {'created': created, 'failed': len(results) - created, 'results': results}
+
+
+def _status_name(shipment_status_id):
+    status = shipment_status_reference.get(shipment_status_id) if shipment_status_id is not None else None
+    return status['shipment_status_name'] if status else None
+
+
+def get_shipment_timeline(tracking_number):
+    """
+    Reads a shipment and its events, oldest first, in one query: the unique index on
+    tracking_number finds the shipment and ix_event_shipment_id_event_date its events
+    in date order. Status names come from the shared shipment status snapshot.
+
+    Args:
+        tracking_number (str): The normalized tracking number.
+
+    Returns:
+        dict: The shipment and its events as described by shipment_timeline_schema, or
+        None if there is no shipment with that tracking number.
+    """
+    rows = db.session.execute(
+        select(
+            Shipment.shipment_id,
+            Shipment.tracking_number,
+            Shipment.shipping_type,
+            Shipment.shipment_status_id,
+            Shipment.shipment_date,
+            Shipment.estimated_delivery_date,
+            Shipment.actual_delivery_date,
+            Event.event_id,
+            Event.shipment_status_id.label('event_status_id'),
+            Event.event_date,
+            Event.comment
+        )
+        .outerjoin(Event, Event.shipment_id == Shipment.shipment_id)
+        .where(Shipment.tracking_number == tracking_number)
+        .order_by(Event.event_date, Event.event_id)
+    ).all()
+    if not rows:
+        return None
+    shipment = rows[0]
+    return {
+        'shipment_id': shipment.shipment_id,
+        'tracking_number': shipment.tracking_number,
+        'shipping_type': shipment.shipping_type,
+        'shipment_status_id': shipment.shipment_status_id,
+        'shipment_status_name': _status_name(shipment.shipment_status_id),
+        'shipment_date': shipment.shipment_date,
+        'estimated_delivery_date': shipment.estimated_delivery_date,
+        'actual_delivery_date': shipment.actual_delivery_date,
+        'events': [
+            {
+                'event_id': row.event_id,
+                'shipment_status_id': row.event_status_id,
+                'shipment_status_name': _status_name(row.event_status_id),
+                'event_date': row.event_date,
+                'comment': row.comment
+            }
+            for row in rows if row.event_id is not None
+        ]
+    }
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+def compact_timeline(timeline):
+    """
+    Shrinks a timeline for mobile clients: no ids, dates as Unix timestamps and each
+    event as a [date, status name, comment] array.
+
+    Args:
+        timeline (dict): A timeline as returned by get_shipment_timeline.
+
+    Returns:
+        dict: The compact timeline.
+    """
+    return {
+        'tracking_number': timeline['tracking_number'],
+        'status': timeline['shipment_status_name'],
+        'shipment_date': _timestamp(timeline['shipment_date']),
+        'estimated_delivery_date': _timestamp(timeline['estimated_delivery_date']),
+        'actual_delivery_date': _timestamp(timeline['actual_delivery_date']),
+        'events': [
+            [_timestamp(event['event_date']), event['shipment_status_name'], event['comment']]
+            for event in timeline['events']
+        ]
+    }
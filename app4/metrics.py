@@ -0,0 +1,338 @@
+# Flask
+from flask import Response, g, request
+from flask_jwt_extended import jwt_required
+# Python
+import atexit
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from time import perf_counter
+# App
+from __init__ import db
+from audit import audit_logger
+from constants import (
+    METRICS_DIR,
+    METRICS_DUMP_INTERVAL,
+    METRICS_ENABLED,
+    METRICS_TOKEN
+)
+from db_pool import pool_stats
+from sqlstats import query_stats
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Exported pool_stats and audit_logger.metrics values: name -> (metric, type)
+POOL_METRICS = {
+    'size': ('db_pool_size', 'gauge'),
+    'max_overflow': ('db_pool_max_overflow', 'gauge'),
+    'checked_in': ('db_pool_checked_in', 'gauge'),
+    'checked_out': ('db_pool_checked_out', 'gauge'),
+    'overflow': ('db_pool_overflow', 'gauge'),
+    'checkouts': ('db_pool_checkouts_total', 'counter'),
+    'timeouts': ('db_pool_timeouts_total', 'counter'),
+    'wait_total': ('db_pool_wait_seconds_total', 'counter')
+}
+AUDIT_METRICS = {
+    'enqueued': ('audit_log_enqueued_total', 'counter'),
+    'flushed': ('audit_log_flushed_total', 'counter'),
+    'dropped': ('audit_log_dropped_total', 'counter'),
+    'failed': ('audit_log_failed_total', 'counter'),
+    'queued': ('audit_log_queued', 'gauge')
+}
+
+# Counters of the workers that exited, kept so that the totals never go down
+DEAD_SNAPSHOT = 'dead.json'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """
+    Per-route latency histograms, response counters by status code, in-flight
+    requests and the split between database and Python time.
+
+    Every gunicorn worker keeps its own counters and writes them to a file in the
+    metrics directory at most every METRICS_DUMP_INTERVAL seconds, and once more when
+    it exits; /metrics adds up the files of all the workers. As in the multiprocess
+    mode of prometheus_client, the counters of a dead worker are folded into a
+    persistent aggregate (DEAD_SNAPSHOT) and only its gauges are dropped. A worker
+    that is killed outright loses what it counted since its last dump.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._directory = None
+        self._app = None
+        self._reset()
+        # A forked worker starts with empty counters, not with those of its parent
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._next_dump = 0.0
+        self.in_flight = 0
+        # (route, method) -> per-bucket counts (last one is +Inf), sum, db time, queries
+        self.requests = {}
+        # (route, method, status) -> count
+        self.responses = {}
+
+    # The hooks resolve the context locals once: every attribute access through a
+    # proxy costs about a microsecond
+
+    def before_request(self):
+        g._get_current_object()._metrics_start = perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+    def after_request(self, response):
+        g._get_current_object()._metrics_status = response.status_code
+        return response
+
+    def teardown_request(self, exc=None):
+        request_globals = g._get_current_object()
+        start = request_globals.pop('_metrics_start', None)
+        if start is None:
+            return
+        duration = perf_counter() - start
+        queries, db_time = query_stats()
+        current_request = request._get_current_object()
+        rule = current_request.url_rule
+        key = (rule.rule if rule is not None else 'unmatched', current_request.method)
+        response_key = key + (request_globals.get('_metrics_status', 500),)
+        bucket = bisect_left(self.buckets, duration)
+        with self._lock:
+            self.in_flight -= 1
+            series = self.requests.get(key)
+            if series is None:
+                series = self.requests[key] = [0] * (len(self.buckets) + 1) + [0.0, 0.0, 0]
+            series[bucket] += 1
+            series[-3] += duration
+            series[-2] += db_time
+            series[-1] += queries
+            self.responses[response_key] = self.responses.get(response_key, 0) + 1
+        if time.monotonic() >= self._next_dump:
+            self.dump()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: The counters of this worker, with its pool and audit log counters.
+        """
+        with self._lock:
+            requests = [[route, method, list(series)] for (route, method), series in self.requests.items()]
+            responses = [[route, method, status, count] for (route, method, status), count in self.responses.items()]
+            in_flight = self.in_flight
+        pool = pool_stats(db.engine)
+        audit = audit_logger.metrics()
+        return {
+            'requests': requests,
+            'responses': responses,
+            'in_flight': in_flight,
+            'pool': {name: value for name, value in pool.items() if name in POOL_METRICS},
+            'audit': {name: value for name, value in audit.items() if name in AUDIT_METRICS}
+        }
+
+    def dump(self):
+        """Writes the snapshot of this worker to the metrics directory."""
+        self._next_dump = time.monotonic() + METRICS_DUMP_INTERVAL
+        path = os.path.join(self._directory, f'{os.getpid()}.json')
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(temporary_path, path)
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(os.path.join(self._directory, '.lock'), 'a') as lock_file:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _add(totals, snapshot, counters_only=False):
+        requests, responses = totals['requests'], totals['responses']
+        for route, method, series in snapshot['requests']:
+            total = requests.setdefault((route, method), [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+        for route, method, status, count in snapshot['responses']:
+            responses[(route, method, status)] = responses.get((route, method, status), 0) + count
+        if not counters_only:
+            totals['in_flight'] += snapshot['in_flight']
+        for group, metrics in (('pool', POOL_METRICS), ('audit', AUDIT_METRICS)):
+            for name, value in snapshot[group].items():
+                if not counters_only or metrics[name][1] == 'counter':
+                    totals[group][name] = totals[group].get(name, 0) + value
+
+    def _fold_dead(self, path):
+        # Adds the counters of a dead worker to the dead aggregate and removes its
+        # snapshot, under a lock so that concurrent scrapes fold it only once
+        with self._directory_lock():
+            if not os.path.exists(path):
+                return
+            snapshot = self._read(path)
+            if snapshot is not None:
+                dead_path = os.path.join(self._directory, DEAD_SNAPSHOT)
+                dead = {'requests': {}, 'responses': {}, 'in_flight': 0, 'pool': {}, 'audit': {}}
+                previous = self._read(dead_path)
+                if previous is not None:
+                    self._add(dead, previous)
+                self._add(dead, snapshot, counters_only=True)
+                temporary_path = f'{dead_path}.tmp'
+                with open(temporary_path, 'w') as dead_file:
+                    json.dump({
+                        'requests': [[route, method, series] for (route, method), series in dead['requests'].items()],
+                        'responses': [
+                            [route, method, status, count]
+                            for (route, method, status), count in dead['responses'].items()
+                        ],
+                        'in_flight': 0,
+                        'pool': dead['pool'],
+                        'audit': dead['audit']
+                    }, dead_file)
+                os.replace(temporary_path, dead_path)
+            os.remove(path)
+
+    def _collect(self):
+        # Adds up the snapshots of the live workers and the dead aggregate, folding
+        # the snapshots of the workers that died since the last scrape into it
+        paths = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.json') or name == DEAD_SNAPSHOT:
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                os.kill(int(name[:-5]), 0)
+            except ProcessLookupError:
+                self._fold_dead(path)
+                continue
+            except (ValueError, PermissionError):
+                pass
+            paths.append(path)
+        totals = {'requests': {}, 'responses': {}, 'in_flight': 0, 'pool': {}, 'audit': {}}
+        for path in paths + [os.path.join(self._directory, DEAD_SNAPSHOT)]:
+            snapshot = self._read(path)
+            if snapshot is not None:
+                self._add(totals, snapshot)
+        return totals.pop('requests'), totals.pop('responses'), totals
+
+    def render(self):
+        """
+        Returns:
+            str: The metrics of all workers in the Prometheus text format.
+        """
+        self.dump()
+        requests, responses, totals = self._collect()
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by route.',
+            '# TYPE http_request_duration_seconds histogram'
+        ]
+        for (route, method), series in sorted(requests.items()):
+            labels = f'route="{_label(route)}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series[-3]}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+        lines += [
+            '# HELP http_request_db_seconds_total Time spent in database queries by route.',
+            '# TYPE http_request_db_seconds_total counter'
+        ]
+        for (route, method), series in sorted(requests.items()):
+            lines.append(f'http_request_db_seconds_total{{route="{_label(route)}",method="{method}"}} {series[-2]}')
+        lines += [
+            '# HELP http_request_db_queries_total Database queries by route.',
+            '# TYPE http_request_db_queries_total counter'
+        ]
+        for (route, method), series in sorted(requests.items()):
+            lines.append(f'http_request_db_queries_total{{route="{_label(route)}",method="{method}"}} {series[-1]}')
+        lines += [
+            '# HELP http_request_python_seconds_total Time spent outside the database by route.',
+            '# TYPE http_request_python_seconds_total counter'
+        ]
+        for (route, method), series in sorted(requests.items()):
+            python_time = max(series[-3] - series[-2], 0.0)
+            lines.append(f'http_request_python_seconds_total{{route="{_label(route)}",method="{method}"}} {python_time}')
+        lines += [
+            '# HELP http_responses_total Responses by route and status code.',
+            '# TYPE http_responses_total counter'
+        ]
+        for (route, method, status), count in sorted(responses.items()):
+            lines.append(
+                f'http_responses_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}'
+            )
+        lines += [
+            '# HELP http_requests_in_flight Requests being served.',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {totals["in_flight"]}'
+        ]
+        for group, metrics in (('pool', POOL_METRICS), ('audit', AUDIT_METRICS)):
+            for name, value in sorted(totals[group].items()):
+                metric, metric_type = metrics[name]
+                lines += [f'# TYPE {metric} {metric_type}', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def _dump_at_exit(self):
+        # A worker stopped by gunicorn (restart, max_requests) leaves its last counts
+        # for the dead aggregate
+        if self.requests and self._app is not None:
+            with self._app.app_context():
+                self.dump()
+
+    def _authorized(self):
+        token = request.headers.get('Authorization', '')
+        return hmac.compare_digest(token.encode(), f'Bearer {METRICS_TOKEN}'.encode())
+
+    def _endpoint(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def init_app(self, app):
+        """
+        Registers the request hooks and the /metrics endpoint, which requires an
+        access token, or the static METRICS_TOKEN for Prometheus when it is set.
+
+        Args:
+            app: The Flask app.
+        """
+        if not METRICS_ENABLED:
+            return
+        # One directory per app, so that services sharing a host don't mix up
+        app_id = hashlib.sha256(os.path.dirname(os.path.abspath(__file__)).encode()).hexdigest()[:12]
+        self._directory = os.path.join(METRICS_DIR or tempfile.gettempdir(), f'metrics-{app_id}')
+        os.makedirs(self._directory, exist_ok=True)
+        self._app = app
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        atexit.register(self._dump_at_exit)
+        if METRICS_TOKEN:
+            def endpoint():
+                if not self._authorized():
+                    return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'})
+                return self._endpoint()
+        else:
+            endpoint = jwt_required()(self._endpoint)
+        app.add_url_rule('/metrics', 'metrics', endpoint)
+
+
+request_metrics = RequestMetrics()
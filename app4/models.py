@@ -1,4 +1,22 @@
 from __init__ import db
+from sqlalchemy.orm import validates
+
+
+def normalize_tracking_number(tracking_number):
+    """
+    Normalizes a tracking number so that lookups can use exact, indexed comparisons.
+
+    Args:
+        tracking_number (str): The tracking number as typed or scanned.
+
+    Returns:
+        str: The tracking number without whitespace and in upper case, or None if
+        nothing is left, like a shipment without a tracking number.
+    """
+    if tracking_number is None:
+        return None
+    return ''.join(tracking_number.split()).upper() or None
+
 
 class ShipmentStatus(db.Model):
     __tablename__ = 'Shipment_Status'
@@ -11,7 +29,7 @@ class Shipment(db.Model):
     __table_args__ = {'schema': 'shipment_schema'}
     
     shipment_id = db.Column(db.Integer, primary_key=True)
-    tracking_number = db.Column(db.String)
+    tracking_number = db.Column(db.String, unique=True, index=True)
     order_id = db.Column(db.Integer)
     shipping_type = db.Column(db.String)
     sender_name = db.Column(db.String)
@@ -25,13 +43,25 @@ class Shipment(db.Model):
     actual_delivery_date = db.Column(db.DateTime)
     events = db.relationship("Event", back_populates="shipment")
 
+    @validates('tracking_number')
+    def validate_tracking_number(self, key, tracking_number):
+        return normalize_tracking_number(tracking_number)
+
 class Event(db.Model):
     __tablename__ = 'Event'
-    __table_args__ = {'schema': 'shipment_schema'}
+    # Partitioned by month on PostgreSQL, see partitions.py
+    __table_args__ = {
+        'schema': 'shipment_schema',
+        'postgresql_partition_by': 'RANGE (event_date)',
+        'info': {'partition_key': 'event_date'}
+    }
     event_id = db.Column(db.Integer, primary_key=True)
     shipment_id = db.Column(db.Integer, db.ForeignKey('shipment_schema.Shipment.shipment_id'))
     shipment_status_id = db.Column(db.Integer, db.ForeignKey('shipment_schema.Shipment_Status.shipment_status_id'))
-    event_date = db.Column(db.DateTime)
+    event_date = db.Column(db.DateTime, nullable=False)
     comment = db.Column(db.String)
     shipment = db.relationship("Shipment", back_populates="events")
 
+# Events of a shipment in date order, as read by the tracking timeline, without a sort
+db.Index('ix_event_shipment_id_event_date', Event.shipment_id, Event.event_date)
+
@@ -2,26 +2,52 @@
 from flask import request
 from flask_restx import Resource
 from flask_jwt_extended import jwt_required
+# SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 # App
 from models import *
 from schemas import *
+from pagination import (
+    paginate,
+    pagination_params
+)
+from export import (
+    export_params,
+    stream_export
+)
+from serializer import (
+    serialize,
+    serialize_with
+)
+from partitions import (
+    filter_time_range,
+    time_range_params
+)
+from permissions import permission_required
+from functions import (
+    TIMELINE_FORMATS,
+    compact_timeline,
+    create_events_in_bulk,
+    get_shipment_timeline
+)
 from datetime import datetime
 
 def register_routes(api):
     # Namespaces
-    ns_shipment = api.namespace('shipment', description='Shipment related operations')
-    ns_event = api.namespace('event', description='Event related operations')
-    ns_shipment_status = api.namespace('shipment-status', description='Shipment Status related operations')
+    ns_shipment = api.namespace('shipment', description='Shipment related operations', decorators=[permission_required('shipment')])
+    ns_event = api.namespace('event', description='Event related operations', decorators=[permission_required('event')])
+    ns_shipment_status = api.namespace('shipment-status', description='Shipment Status related operations', decorators=[permission_required('shipment-status')])
 
 
     # Shipment Routes
     @ns_shipment.route('/')
     class ShipmentList(Resource):
         @jwt_required()
-        @api.marshal_list_with(shipment_schema)
+        @api.doc(params=pagination_params)
+        @serialize_with(shipment_schema, as_list=True)
         def get(self):
             """List all shipments"""
-            return Shipment.query.all()
+            return paginate(Shipment.query.options(shipment_loader), Shipment.shipment_id)
 
         @jwt_required()
         @api.expect(shipment_schema_input)
@@ -29,18 +55,39 @@ def register_routes(api):
         def post(self):
             """Create a new shipment"""
             new_shipment = Shipment(**request.json)
+            tracking_number = new_shipment.tracking_number
+            if tracking_number and Shipment.query.filter_by(tracking_number=tracking_number).first() is not None:
+                ns_shipment.abort(400, "Tracking number already exists")
             db.session.add(new_shipment)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent create took the tracking number after the check
+                db.session.rollback()
+                if tracking_number and Shipment.query.filter_by(tracking_number=tracking_number).first() is not None:
+                    ns_shipment.abort(409, "Tracking number already exists")
+                raise
             return new_shipment, 201
         
         
+    @ns_shipment.route('/export')
+    class ShipmentExport(Resource):
+        @jwt_required()
+        @api.doc(params=export_params)
+        @api.produces(['application/x-ndjson', 'text/csv'])
+        def get(self):
+            """Export all shipments with their events as NDJSON or CSV"""
+            statement = db.select(Shipment).options(shipment_loader).order_by(Shipment.shipment_id)
+            return stream_export(statement, shipment_schema, 'shipments')
+
+
     @ns_shipment.route('/<int:shipment_id>')
     class ShipmentItem(Resource):
         @jwt_required()
         @api.marshal_with(shipment_schema)
         def get(self, shipment_id):
             """Retrieve a specific shipment by shipment ID"""
-            shipment = Shipment.query.get(shipment_id)
+            shipment = Shipment.query.options(shipment_loader).get(shipment_id)
             if not shipment:
                 ns_shipment.abort(404, "Shipment not found")
             return shipment
@@ -52,20 +99,62 @@ def register_routes(api):
         @api.marshal_with(shipment_schema)
         def get(self, tracking_number):
             """Retrieve a specific shipment by tracking number"""
-            shipment = Shipment.query.filter(Shipment.tracking_number.ilike(f'%{tracking_number}%')).first()
+            tracking_number = normalize_tracking_number(tracking_number)
+            # A blank tracking number would match the shipments without one
+            shipment = tracking_number and Shipment.query.options(shipment_loader).filter_by(
+                tracking_number=tracking_number
+            ).first()
             if not shipment:
                 ns_shipment.abort(404, "Shipment with tracking number provided not found")
             return shipment
 
 
+    @ns_shipment.route('/<string:tracking_number>/timeline')
+    class ShipmentTimeline(Resource):
+        @jwt_required()
+        @api.doc(params={'format': (
+            "'full' (default) or 'compact': no ids, dates as Unix timestamps and events "
+            "as [date, status, comment] arrays"
+        )})
+        @api.response(200, 'Success', shipment_timeline_schema)
+        def get(self, tracking_number):
+            """Retrieve a shipment and its events, oldest first, by tracking number"""
+            timeline_format = request.args.get('format', 'full')
+            if timeline_format not in TIMELINE_FORMATS:
+                ns_shipment.abort(400, "format must be 'full' or 'compact'")
+            tracking_number = normalize_tracking_number(tracking_number)
+            timeline = get_shipment_timeline(tracking_number) if tracking_number else None
+            if timeline is None:
+                ns_shipment.abort(404, "Shipment with tracking number provided not found")
+            if timeline_format == 'compact':
+                return compact_timeline(timeline)
+            return serialize(timeline, shipment_timeline_schema)
+
+
+    @ns_shipment.route('/search/<string:tracking_number>')
+    class ShipmentSearchTracking(Resource):
+        @jwt_required()
+        @api.doc(params=pagination_params)
+        @serialize_with(shipment_schema, as_list=True)
+        def get(self, tracking_number):
+            """Search shipments whose tracking number contains the given text"""
+            term = normalize_tracking_number(tracking_number) or ''
+            if len(term) < 3:
+                ns_shipment.abort(400, "Search term must have at least 3 characters")
+            term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = Shipment.query.options(shipment_loader).filter(Shipment.tracking_number.like(f'%{term}%', escape='\\'))
+            return paginate(query, Shipment.shipment_id)
+
+
     # Event Routes
     @ns_event.route('/')
     class EventList(Resource):
         @jwt_required()
-        @api.marshal_list_with(event_schema)
+        @api.doc(params={**pagination_params, **time_range_params})
+        @serialize_with(event_schema, as_list=True)
         def get(self):
             """List all events"""
-            return Event.query.all()
+            return paginate(filter_time_range(Event.query, Event.event_date), Event.event_id)
         
         @jwt_required()
         @api.doc('register_an_event')
@@ -75,6 +164,8 @@ def register_routes(api):
             """Create a new event"""
 
             data = request.json
+            if not shipment_status_reference.get(data['shipment_status_id']):
+                api.abort(400, "Shipment status not found")
             # Obtener el envío
             shipment = Shipment.query.get(data['shipment_id'])
             
@@ -99,6 +190,32 @@ def register_routes(api):
                 api.abort(404, "Shipment not found")
             
 
+    @ns_event.route('/export')
+    class EventExport(Resource):
+        @jwt_required()
+        @api.doc(params={**export_params, **time_range_params})
+        @api.produces(['application/x-ndjson', 'text/csv'])
+        def get(self):
+            """Export all events as NDJSON or CSV"""
+            statement = filter_time_range(db.select(Event), Event.event_date).order_by(Event.event_id)
+            return stream_export(statement, event_schema, 'events')
+
+
+    @ns_event.route('/batch')
+    class EventBatch(Resource):
+        @jwt_required()
+        @api.doc('register_events_in_bulk', description=(
+            'Registers a batch of scans, e.g. uploaded by a hub scanner after reconnecting. '
+            'Returns 201 if every event was created, 207 otherwise.'
+        ))
+        @api.expect([bulk_event_schema_input])
+        @api.marshal_with(bulk_event_response_schema, code=201)
+        def post(self):
+            """Register events in bulk"""
+            result = create_events_in_bulk(request.get_json(silent=True))
+            return result, 201 if result['failed'] == 0 else 207
+
+
     @ns_event.route('/<int:event_id>')
     class EventItem(Resource):
         @jwt_required()
@@ -115,10 +232,11 @@ def register_routes(api):
     @ns_shipment_status.route('/')
     class ShipmentStatusList(Resource):
         @jwt_required()
-        @api.marshal_list_with(shipment_status_schema)
+        @api.response(200, 'Success', [shipment_status_schema])
+        @api.response(304, 'Not modified')
         def get(self):
             """List all shipment statuses"""
-            return ShipmentStatus.query.all()
+            return shipment_status_reference.response()
 
         @jwt_required()
         @api.expect(shipment_status_schema_input)
@@ -128,6 +246,7 @@ def register_routes(api):
             new_shipment_status = ShipmentStatus(**request.json)
             db.session.add(new_shipment_status)
             db.session.commit()
+            shipment_status_reference.bump()
             return new_shipment_status, 201
 
 
@@ -136,7 +255,7 @@ def register_routes(api):
         @jwt_required()
         @api.marshal_with(shipment_status_schema)
         def get(self, shipment_status_id):
-            shipment_status = ShipmentStatus.query.get(shipment_status_id)
+            shipment_status = shipment_status_reference.get(shipment_status_id)
             if not shipment_status:
                 ns_shipment.abort(404, "Shipment status not found")
             return shipment_status
@@ -1,5 +1,9 @@
 from flask_restx import fields
+from sqlalchemy.orm import selectinload
 from __init__ import api
+from models import Shipment, ShipmentStatus
+from reference import ReferenceData
+from serializer import serialize
 
 
 event_schema = api.model('Event', {
@@ -36,6 +40,29 @@ shipment_schema = api.model('Shipment', {
 
 })
 
+# Relationships serialized by shipment_schema, loaded up front to avoid N+1 queries
+shipment_loader = selectinload(Shipment.events)
+
+timeline_event_schema = api.model('Timeline_Event', {
+    'event_id': fields.Integer(description='Event ID'),
+    'shipment_status_id': fields.Integer(description='Shipment Status ID'),
+    'shipment_status_name': fields.String(description='Shipment Status Name'),
+    'event_date': fields.DateTime(description='Event Date'),
+    'comment': fields.String(description='Comment')
+})
+
+shipment_timeline_schema = api.model('Shipment_Timeline', {
+    'shipment_id': fields.Integer(description='Shipment ID'),
+    'tracking_number': fields.String(description='Tracking Number'),
+    'shipping_type': fields.String(description='Shipping Type'),
+    'shipment_status_id': fields.Integer(description='Shipment Status ID'),
+    'shipment_status_name': fields.String(description='Shipment Status Name'),
+    'shipment_date': fields.DateTime(description='Shipment Date'),
+    'estimated_delivery_date': fields.DateTime(description='Estimated Delivery Date'),
+    'actual_delivery_date': fields.DateTime(description='Actual Delivery Date'),
+    'events': fields.List(fields.Nested(timeline_event_schema), description='Events, oldest first')
+})
+
 shipment_schema_input = api.model('Shipment', {
     'tracking_number': fields.String(description='Tracking Number'),
     'order_id': fields.Integer(description='Order ID'),
@@ -64,3 +91,31 @@ shipment_status_schema = api.model('ShipmentStatus', {
 shipment_status_schema_input = api.model('ShipmentStatus', {    
     'shipment_status_name': fields.String(description='Shipment Status Name')
 })
+
+
+bulk_event_result_schema = api.model('Bulk_Event_Result', {
+    'index': fields.Integer(description='Position of the event in the request'),
+    'status': fields.String(description="'created' or 'error'"),
+    'event_id': fields.Integer(description='Event ID, if created'),
+    'error': fields.String(description='Reason the event was rejected')
+})
+
+bulk_event_response_schema = api.model('Bulk_Event_Response', {
+    'created': fields.Integer(description='Number of events created'),
+    'failed': fields.Integer(description='Number of events rejected'),
+    'results': fields.List(fields.Nested(bulk_event_result_schema))
+})
+
+bulk_event_schema_input = api.model('Bulk_Event_Input', {
+    'shipment_id': fields.Integer(required=True, description='Shipment ID'),
+    'shipment_status_id': fields.Integer(required=True, description='Shipment Status ID'),
+    'event_date': fields.DateTime(description='Scan date, defaults to the time of upload'),
+    'comment': fields.String(description='Comment')
+})
+
+# Cached GET /shipment-status/ response, bumped when a shipment status is created
+shipment_status_reference = ReferenceData(
+    'shipment_statuses',
+    lambda: serialize(ShipmentStatus.query.all(), shipment_status_schema),
+    key='shipment_status_id'
+)
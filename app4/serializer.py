@@ -0,0 +1,179 @@
+# Flask
+from flask import current_app, has_request_context, request
+from flask_restx import fields, marshal
+from flask_restx.fields import is_indexable_but_not_string
+from flask_restx.inputs import boolean
+from flask_restx.utils import merge, unpack
+# Python
+from datetime import datetime
+from functools import wraps
+from http import HTTPStatus
+
+
+_compiled = {}
+
+
+def _plain(obj):
+    # Dicts, lists and strings go through flask_restx' own lookup rules
+    return not is_indexable_but_not_string(obj) and not hasattr(obj, 'strip')
+
+
+def _compile_field(key, field):
+    """
+    Returns a function that produces the same output as ``field.output(key, obj)``
+    for objects read through getattr, such as ORM instances.
+    """
+    attribute = key if field.attribute is None else field.attribute
+    generic = lambda obj: field.output(key, obj)
+    if not isinstance(attribute, str) or '.' in attribute or getattr(field, 'mask', None) or callable(field.default):
+        return generic
+    field_type = type(field)
+
+    if field_type is fields.List:
+        container = field.container
+        if type(container) is not fields.Nested or container.attribute is not None or callable(container.default):
+            return generic
+        nested = _compile_nested(container)
+        list_default = field.default
+
+        def output_list(obj):
+            value = getattr(obj, attribute, None)
+            if is_indexable_but_not_string(value) and not isinstance(value, dict):
+                return [nested(item) for item in value]
+            if value is None:
+                return list_default
+            return [_serializer(container.nested)(value)]
+        return output_list
+
+    if field_type is fields.Nested:
+        return _compile_nested(field, attribute)
+
+    format_value = {
+        fields.Integer: int,
+        fields.Float: float,
+        fields.String: str,
+        fields.Boolean: boolean,
+    }.get(field_type)
+    if field_type is fields.DateTime and field.dt_format == 'iso8601':
+        format_value = lambda value: value.isoformat() if type(value) is datetime else field.format(value)
+    if format_value is None:
+        return generic
+    none_value = field.format(field.default) if field.default else field.default
+
+    def output(obj):
+        value = getattr(obj, attribute, None)
+        if value is None:
+            return none_value
+        try:
+            return format_value(value)
+        except Exception:
+            # Let flask_restx raise its own MarshallingError
+            return field.output(key, obj)
+    return output
+
+
+def _compile_nested(field, attribute=None):
+    """
+    Returns a function that serializes the value of a Nested field, or the value
+    itself when ``attribute`` is None (items of a List).
+    """
+    nested_model = field.nested
+
+    def output_nested(value):
+        if value is None:
+            if field.allow_null:
+                return None
+            if field.default is not None:
+                return field.default
+        if field.skip_none:
+            return marshal(value, nested_model, skip_none=True)
+        return _serializer(nested_model)(value)
+
+    if attribute is None:
+        return output_nested
+    return lambda obj: output_nested(getattr(obj, attribute, None))
+
+
+def compile_model(model):
+    """
+    Compiles an api.model into a function that serializes one object, resolving
+    the field types, defaults and nested models once instead of on every call.
+
+    Args:
+        model: The api.model (or dict of fields) to compile.
+
+    Returns:
+        function: Takes one object and returns the same dict as ``marshal``.
+    """
+    model = getattr(model, 'resolved', model)
+    steps = tuple(
+        (key, _compile_field(key, field() if isinstance(field, type) else field))
+        for key, field in model.items()
+    )
+
+    def serialize_object(obj):
+        if not _plain(obj):
+            return marshal(obj, model)
+        return {key: output(obj) for key, output in steps}
+    return serialize_object
+
+
+def _serializer(model):
+    # The model is kept in the cache so that its id is never reused
+    cached = _compiled.get(id(model))
+    if cached is None:
+        cached = _compiled[id(model)] = (model, compile_model(model))
+    return cached[1]
+
+
+def serialize(data, model):
+    """
+    Serializes an object, or a list of objects, exactly like ``marshal(data, model)``.
+
+    Args:
+        data: The object or list of objects to serialize.
+        model: The api.model to serialize with.
+
+    Returns:
+        dict or list: The serialized data.
+    """
+    serializer = _serializer(model)
+    if isinstance(data, (list, tuple)):
+        return [serializer(item) for item in data]
+    return serializer(data)
+
+
+def serialize_with(model, as_list=False, code=HTTPStatus.OK, description=None):
+    """
+    Drop-in replacement for ``ns.marshal_with`` / ``ns.marshal_list_with`` that
+    serializes with the compiled model. The Swagger documentation is generated
+    from the same model. Requests with a field mask header fall back to ``marshal``.
+
+    Args:
+        model: The api.model to serialize with.
+        as_list (bool): Whether the response is a list of the model.
+        code (int): The documented status code.
+        description (str): The documented response description.
+    """
+    def wrapper(func):
+        doc = {
+            'responses': {
+                str(code): (description, [model], {}) if as_list else (description, model, {})
+            },
+            '__mask__': True
+        }
+        func.__apidoc__ = merge(getattr(func, '__apidoc__', {}), doc)
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            resp = func(*args, **kwargs)
+            data, status, headers = unpack(resp) if isinstance(resp, tuple) else (resp, None, {})
+            mask = None
+            if has_request_context():
+                mask = request.headers.get(current_app.config['RESTX_MASK_HEADER'])
+            data = marshal(data, model, mask=mask) if mask else serialize(data, model)
+            if status is None and not headers:
+                return data
+            return data, status, headers
+        return inner
+    return wrapper
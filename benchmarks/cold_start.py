@@ -0,0 +1,55 @@
+"""
+Measures the cold start of an app: the time from launching a process until create_app
+returns, compared with create_app followed by the schema setup that used to run inside
+it (now ``flask --app wsgi init-db``).
+
+Usage (from the repository root, with the requirements installed and POSTGRES_*
+pointing at a database that has already been initialized):
+    python benchmarks/cold_start.py [--app app4] [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+STARTUP = '''
+import sys
+from __init__ import create_app
+app = create_app()
+if sys.argv[1] == 'init-db':
+    from commands import init_db
+    with app.app_context():
+        init_db()
+'''
+
+
+def measure(app_dir, mode, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', STARTUP, mode], cwd=app_dir, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='app4', choices=['app1', 'app2', 'app3', 'app4'])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    app_dir = os.path.join(ROOT, args.app)
+    results = {mode: measure(app_dir, mode, args.runs) for mode in ('create-app', 'init-db')}
+    for mode, timings in results.items():
+        print(f'{mode:>10}: median {statistics.median(timings) * 1e3:7.1f} ms, '
+              f'min {min(timings) * 1e3:7.1f} ms over {args.runs} runs')
+    saved = statistics.median(results['init-db']) - statistics.median(results['create-app'])
+    print(f'{"saved":>10}: {saved * 1e3:7.1f} ms per process start')
+
+
+if __name__ == '__main__':
+    main()
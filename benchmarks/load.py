@@ -0,0 +1,564 @@
+"""
+Load benchmark of the four services. Each app is booted with create_app in its own
+process against PostgreSQL or a SQLite stand-in, seeded with a fixed volume of data,
+and driven by concurrent keep-alive clients on its hot endpoints (login, tracking
+lookup, order create, event post and the list endpoints). The p50/p95/p99 latency
+and requests per second of every endpoint are written as JSON, so that runs on
+different commits can be compared with --compare.
+
+Seeding empties the tables of the booted apps: point --database-url at a dedicated
+database. Without it, a new SQLite database is created in a temporary directory.
+app1 is always booted first, since it holds the users and access controls the other
+apps check, and its login provides the access token.
+
+The apps run on werkzeug's threaded server rather than gunicorn, so absolute numbers
+are only meaningful against other runs on the same machine and database.
+
+Usage (from the repository root, with the requirements installed):
+    python benchmarks/load.py [--apps app3 app4] [--database-url postgresql://...]
+        [--concurrency 16] [--duration 20] [--scale 1] [--output results.json]
+        [--compare previous.json]
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APPS = ('app1', 'app2', 'app3', 'app4')
+SCHEMAS = ('Security', 'Client', 'order_schema', 'shipment_schema')
+
+USERNAME = 'user0'
+PASSWORD = 'benchmark-password'
+# Row counts at --scale 1
+VOLUMES = {
+    'users': 1000,
+    'logs': 100000,
+    'customers': 10000,
+    'orders': 20000,
+    'shipments': 20000
+}
+RESOURCES = (
+    'users', 'roles', 'logs', 'access_controls', 'customer', 'address',
+    'order', 'shipment-type', 'shipment', 'event', 'shipment-status'
+)
+CHUNK_SIZE = 5000
+
+
+# Server side: runs inside the app process
+
+def _use_sqlite_schemas(database_url):
+    # SQLite has no schemas: each one is a database file attached next to the main one
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.schema import CreateSchema
+
+    directory = os.path.dirname(database_url[len('sqlite:///'):])
+
+    @event.listens_for(Engine, 'connect')
+    def attach_schemas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f'ATTACH DATABASE "{os.path.join(directory, schema)}.db" AS "{schema}"')
+            dbapi_connection.execute(f'PRAGMA "{schema}".journal_mode=WAL')
+
+    @compiles(CreateSchema, 'sqlite')
+    def create_schema(element, compiler, **kw):
+        return 'SELECT 1'
+
+
+def _empty(db, models):
+    tables = [model.__table__ for model in models]
+    if db.engine.dialect.name == 'postgresql':
+        names = ', '.join(f'"{table.schema}"."{table.name}"' for table in tables)
+        db.session.execute(db.text(f'TRUNCATE {names} RESTART IDENTITY CASCADE'))
+    else:
+        for table in tables:
+            db.session.execute(table.delete())
+    db.session.commit()
+
+
+def _insert(db, model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(db.insert(model), rows[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def _seed_app1(db, rng, scale):
+    from functions import hash_password
+    from models import AccessControl, Log, Role, User
+    from schemas import role_reference
+
+    _empty(db, [Log, User, AccessControl, Role])
+    roles = ['admin', 'operator', 'driver', 'customer-service']
+    _insert(db, Role, [{'name': name} for name in roles])
+    _insert(db, AccessControl, [
+        {'role_id': role_id, 'resource': resource, 'read_permission': True, 'write_permission': role_id == 1}
+        for role_id in range(1, len(roles) + 1) for resource in RESOURCES
+    ])
+    # One bcrypt hash for every user: hashing each one would dominate the seeding
+    hashed_password = hash_password(PASSWORD)
+    users = max(int(VOLUMES['users'] * scale), 1)
+    _insert(db, User, [
+        {'username': f'user{i}', 'hashed_password': hashed_password, 'role_id': 1 if i == 0 else 1 + i % len(roles)}
+        for i in range(users)
+    ])
+    now = datetime.now()
+    _insert(db, Log, [
+        {
+            'user_id': rng.randint(1, users),
+            'action': rng.choice(['login', 'create order', 'update shipment', 'export']),
+            'timestamp': now - timedelta(minutes=i)
+        }
+        for i in range(int(VOLUMES['logs'] * scale))
+    ])
+    role_reference.bump()
+    return {'users': users}
+
+
+def _seed_app2(db, rng, scale):
+    from models import Address, Customer
+
+    _empty(db, [Address, Customer])
+    customers = max(int(VOLUMES['customers'] * scale), 1)
+    _insert(db, Customer, [
+        {
+            'type': rng.choice(['individual', 'business']),
+            'name': f'Customer {i}',
+            'email': f'customer{i}@example.com',
+            'company': f'Company {i % 500}'
+        }
+        for i in range(customers)
+    ])
+    _insert(db, Address, [
+        {
+            'customer_id': customer_id,
+            'address': f'{rng.randint(1, 999)} Orchard Road',
+            'suburb': rng.choice(['Orchard', 'Bedok', 'Jurong', 'Tampines']),
+            'city': 'Singapore',
+            'state': 'Singapore',
+            'country': 'Singapore'
+        }
+        for customer_id in range(1, customers + 1) for _ in range(2)
+    ])
+    return {'customers': customers}
+
+
+def _seed_app3(db, rng, scale):
+    from models import Order, OrderItem, ShipmentType
+    from schemas import shipment_type_reference
+
+    _empty(db, [OrderItem, Order, ShipmentType])
+    shipment_types = ['Standard', 'Express', 'Same day', 'Bulk']
+    _insert(db, ShipmentType, [
+        {'shipment_type_name': name, 'description': f'{name} delivery'} for name in shipment_types
+    ])
+    orders = max(int(VOLUMES['orders'] * scale), 1)
+    now = datetime.now()
+    _insert(db, Order, [
+        {
+            'sender_id': rng.randint(1, 10000),
+            'sender_name': f'Sender {rng.randint(1, 2000)}',
+            'sender_address': f'{rng.randint(1, 999)} Orchard Road',
+            'receiver_id': rng.randint(1, 10000),
+            'receiver_name': f'Receiver {rng.randint(1, 2000)}',
+            'receiver_address': f'{rng.randint(1, 999)} Bedok North Street',
+            'receiver_phone': f'+65 {rng.randint(80000000, 99999999)}',
+            'order_date': now - timedelta(minutes=i),
+            'total_amount': round(rng.uniform(5, 200), 2),
+            'shipment_type_id': rng.randint(1, len(shipment_types))
+        }
+        for i in range(orders)
+    ])
+    _insert(db, OrderItem, [
+        {
+            'order_id': order_id,
+            'weight': round(rng.uniform(0.1, 30), 2),
+            'length': rng.randint(5, 100),
+            'width': rng.randint(5, 100),
+            'height': rng.randint(5, 100),
+            'quantity': rng.randint(1, 5),
+            'price': round(rng.uniform(1, 50), 2)
+        }
+        for order_id in range(1, orders + 1) for _ in range(rng.randint(1, 5))
+    ])
+    shipment_type_reference.bump()
+    return {'orders': orders, 'shipment_types': len(shipment_types)}
+
+
+def _seed_app4(db, rng, scale):
+    from models import Event, Shipment, ShipmentStatus
+    from schemas import shipment_status_reference
+
+    _empty(db, [Event, Shipment, ShipmentStatus])
+    statuses = ['Created', 'Picked up', 'In transit', 'Delivered', 'Out for delivery']
+    _insert(db, ShipmentStatus, [{'shipment_status_name': name} for name in statuses])
+    shipments = max(int(VOLUMES['shipments'] * scale), 1)
+    now = datetime.now()
+    _insert(db, Shipment, [
+        {
+            'tracking_number': f'XD{i:08d}',
+            'order_id': i + 1,
+            'shipping_type': rng.choice(['Standard', 'Express']),
+            'sender_name': f'Sender {rng.randint(1, 2000)}',
+            'receiver_name': f'Receiver {rng.randint(1, 2000)}',
+            'shipment_status_id': rng.randint(1, len(statuses)),
+            'shipment_date': now - timedelta(hours=i)
+        }
+        for i in range(shipments)
+    ])
+    _insert(db, Event, [
+        {
+            'shipment_id': shipment_id,
+            'shipment_status_id': status_id,
+            'event_date': now - timedelta(hours=shipment_id, minutes=-status_id),
+            'comment': None
+        }
+        for shipment_id in range(1, shipments + 1) for status_id in range(1, rng.randint(2, len(statuses)) + 1)
+    ])
+    shipment_status_reference.bump()
+    return {'shipments': shipments, 'statuses': len(statuses)}
+
+
+SEEDERS = {'app1': _seed_app1, 'app2': _seed_app2, 'app3': _seed_app3, 'app4': _seed_app4}
+
+
+def serve(app_name, port, database_url, scale, seed):
+    """
+    Boots and seeds one app, prints what was seeded as a JSON line once it accepts
+    requests, and serves it until terminated.
+    """
+    sys.path.insert(0, os.path.join(ROOT, app_name))
+    if database_url.startswith('sqlite'):
+        _use_sqlite_schemas(database_url)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from __init__ import create_app, db
+    from commands import init_db
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        seeded = SEEDERS[app_name](db, random.Random(seed), scale)
+
+    class RequestHandler(WSGIRequestHandler):
+        # Keep-alive, like a client behind a load balancer, and no access log
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, app, threaded=True, request_handler=RequestHandler)
+    # Exit through the interpreter's shutdown, which stops the password hashing pool
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(json.dumps(seeded), flush=True)
+    server.serve_forever()
+
+
+# Client side
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """One app served by a child process for the length of a ``with`` block."""
+
+    def __init__(self, app_name, database_url, scale, seed):
+        self.app_name = app_name
+        self.port = _free_port()
+        env = dict(os.environ, DATABASE_URL=database_url, FLASK_ENV='production', RBAC_ENABLED='true')
+        env.setdefault('SECRET_KEY', 'benchmark-secret')
+        env.setdefault('JWT_SECRET_KEY', 'benchmark-jwt-secret-benchmark-jwt-secret')
+        self.command = [
+            sys.executable, os.path.abspath(__file__), '--serve', app_name, '--port', str(self.port),
+            '--database-url', database_url, '--scale', str(scale), '--seed', str(seed)
+        ]
+        self.env = env
+        self.process = None
+        self.seeded = None
+
+    def __enter__(self):
+        print(f'{self.app_name}: seeding and starting', file=sys.stderr)
+        self.process = subprocess.Popen(
+            self.command, cwd=os.path.join(ROOT, self.app_name), env=self.env, stdout=subprocess.PIPE, text=True,
+            start_new_session=True
+        )
+        line = self.process.stdout.readline()
+        if not line:
+            self.process.wait()
+            raise RuntimeError(f'{self.app_name} exited with code {self.process.returncode}')
+        self.seeded = json.loads(line)
+        return self
+
+    def __exit__(self, *exc_info):
+        # The whole process group: the app and its password hashing workers
+        os.killpg(self.process.pid, signal.SIGTERM)
+        self.process.wait()
+
+
+def _request(connection, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def login(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    status, body = _request(connection, 'POST', '/login/', {'username': USERNAME, 'password': PASSWORD})
+    connection.close()
+    if status != 200:
+        raise RuntimeError(f'Login failed with {status}: {body[:200]!r}')
+    return json.loads(body)['access_token']
+
+
+_unique = itertools.count()
+
+
+def scenarios(app_name, seeded):
+    """
+    Returns:
+        list: (name, weight, build) tuples, where build(rng) returns the method, path
+        and JSON body of one request.
+    """
+    if app_name == 'app1':
+        users = seeded['users']
+        return [
+            ('login', 1, lambda rng: ('POST', '/login/', {'username': USERNAME, 'password': PASSWORD})),
+            ('user detail', 3, lambda rng: ('GET', f'/users/{rng.randint(1, users)}', None)),
+            ('user list', 2, lambda rng: ('GET', '/users/?limit=100', None)),
+            ('role list', 2, lambda rng: ('GET', '/roles/', None)),
+            ('log list', 2, lambda rng: ('GET', '/logs/?limit=100', None))
+        ]
+    if app_name == 'app2':
+        customers = seeded['customers']
+        return [
+            ('customer detail', 4, lambda rng: ('GET', f'/customer/{rng.randint(1, customers)}', None)),
+            ('customer list', 2, lambda rng: ('GET', '/customer/?limit=100', None)),
+            ('address list', 2, lambda rng: ('GET', '/address/?limit=100', None)),
+            ('customer create', 1, lambda rng: ('POST', '/customer/', {
+                'type': 'individual',
+                'name': 'Load Test',
+                'email': f'load{os.getpid()}-{next(_unique)}@example.com',
+                'company': 'Load Test'
+            }))
+        ]
+    if app_name == 'app3':
+        orders, shipment_types = seeded['orders'], seeded['shipment_types']
+        return [
+            ('order create', 3, lambda rng: ('POST', '/order/create', {
+                'sender_name': f'Sender {rng.randint(1, 2000)}',
+                'receiver_name': f'Receiver {rng.randint(1, 2000)}',
+                'receiver_address': '1 Bedok North Street',
+                'shipment_type_id': rng.randint(1, shipment_types),
+                'items': [
+                    {'weight': 2.5, 'length': 30, 'width': 20, 'height': 10, 'quantity': 1, 'price': 12.5}
+                    for _ in range(rng.randint(1, 3))
+                ]
+            })),
+            ('order detail', 4, lambda rng: ('GET', f'/order/{rng.randint(1, orders)}', None)),
+            ('order list', 2, lambda rng: ('GET', '/order/?limit=100', None)),
+            ('order search', 1, lambda rng: ('GET', f'/order/search/Sender%20{rng.randint(1, 2000)}?limit=20', None))
+        ]
+    shipments, statuses = seeded['shipments'], seeded['statuses']
+    return [
+        ('tracking lookup', 6, lambda rng: ('GET', f'/shipment/XD{rng.randrange(shipments):08d}', None)),
+        ('tracking timeline', 4, lambda rng: ('GET', f'/shipment/XD{rng.randrange(shipments):08d}/timeline', None)),
+        ('event post', 3, lambda rng: ('POST', '/event/', {
+            'shipment_id': rng.randint(1, shipments),
+            'shipment_status_id': rng.randint(1, statuses),
+            'comment': 'Scanned'
+        })),
+        ('shipment list', 2, lambda rng: ('GET', '/shipment/?limit=100', None)),
+        ('event list', 1, lambda rng: ('GET', '/event/?limit=100', None))
+    ]
+
+
+def _client(port, token, app_scenarios, rng, warmup_until, stop_at, results):
+    names = [name for name, _, _ in app_scenarios]
+    weights = [weight for _, weight, _ in app_scenarios]
+    builders = {name: build for name, _, build in app_scenarios}
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while True:
+        name = rng.choices(names, weights)[0]
+        method, path, body = builders[name](rng)
+        start = time.perf_counter()
+        try:
+            status, _ = _request(connection, method, path, body, token)
+        except (OSError, http.client.HTTPException):
+            status = None
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        end = time.perf_counter()
+        if end >= stop_at:
+            break
+        if end >= warmup_until:
+            results.append((name, end - start, status is not None and status < 400))
+    connection.close()
+
+
+def _summary(latencies, errors, duration):
+    summary = {'requests': len(latencies) + errors, 'errors': errors, 'rps': round((len(latencies) + errors) / duration, 1)}
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        summary.update({
+            'p50_ms': round(quantiles[49] * 1e3, 2),
+            'p95_ms': round(quantiles[94] * 1e3, 2),
+            'p99_ms': round(quantiles[98] * 1e3, 2)
+        })
+    return summary
+
+
+def run_load(port, token, app_scenarios, concurrency, warmup, duration, seed):
+    """
+    Drives the app with ``concurrency`` clients for ``warmup + duration`` seconds.
+
+    Returns:
+        dict: The summary of all requests after the warm-up, with one per endpoint.
+    """
+    results = []
+    warmup_until = time.perf_counter() + warmup
+    stop_at = warmup_until + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(port, token, app_scenarios, random.Random(seed + i), warmup_until, stop_at, results)
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    by_endpoint = {name: ([], [0]) for name, _, _ in app_scenarios}
+    for name, latency, ok in results:
+        latencies, errors = by_endpoint[name]
+        if ok:
+            latencies.append(latency)
+        else:
+            errors[0] += 1
+    total = _summary(
+        [latency for name, latency, ok in results if ok],
+        sum(errors[0] for _, errors in by_endpoint.values()),
+        duration
+    )
+    total['endpoints'] = {
+        name: _summary(latencies, errors[0], duration) for name, (latencies, errors) in by_endpoint.items()
+    }
+    return total
+
+
+def _git_revision():
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip())
+        return revision, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _print_results(report, previous=None):
+    header = f'{"endpoint":<24}{"rps":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}'
+    for app_name, result in report['apps'].items():
+        print(f'\n{app_name}\n{header}', file=sys.stderr)
+        rows = list(result['endpoints'].items()) + [('total', result)]
+        for name, summary in rows:
+            line = (f'{name:<24}{summary["rps"]:>10}{summary.get("p50_ms", "-"):>10}'
+                    f'{summary.get("p95_ms", "-"):>10}{summary.get("p99_ms", "-"):>10}{summary["errors"]:>8}')
+            before = (previous or {}).get('apps', {}).get(app_name, {})
+            before = before if name == 'total' else before.get('endpoints', {}).get(name)
+            if before and before.get('rps') and before.get('p95_ms') and summary.get('p95_ms'):
+                line += (f'   rps {(summary["rps"] / before["rps"] - 1) * 100:+.1f}%'
+                         f'  p95 {(summary["p95_ms"] / before["p95_ms"] - 1) * 100:+.1f}%')
+            print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', nargs='+', default=list(APPS), choices=APPS)
+    parser.add_argument('--database-url', help='Default: a new SQLite database in a temporary directory')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of load before measuring')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load per app')
+    parser.add_argument('--scale', type=float, default=1, help='Multiplier of the seeded volumes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--compare', help='A previous JSON report to compare with')
+    parser.add_argument('--serve', choices=APPS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.database_url, args.scale, args.seed)
+        return
+
+    revision, dirty = _git_revision()
+    report = {
+        'revision': revision,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'database': (args.database_url or 'sqlite').split(':', 1)[0].split('+', 1)[0],
+        'concurrency': args.concurrency,
+        'warmup': args.warmup,
+        'duration': args.duration,
+        'scale': args.scale,
+        'seed': args.seed,
+        'volumes': {name: int(count * args.scale) for name, count in VOLUMES.items()},
+        'apps': {}
+    }
+    with tempfile.TemporaryDirectory(prefix='xdel-load-') as directory:
+        database_url = args.database_url or f'sqlite:///{directory}/main.db'
+        with AppProcess('app1', database_url, args.scale, args.seed) as app1:
+            token = login(app1.port)
+            if 'app1' in args.apps:
+                print('app1: running', file=sys.stderr)
+                report['apps']['app1'] = run_load(
+                    app1.port, token, scenarios('app1', app1.seeded),
+                    args.concurrency, args.warmup, args.duration, args.seed
+                )
+        for app_name in args.apps:
+            if app_name == 'app1':
+                continue
+            with AppProcess(app_name, database_url, args.scale, args.seed) as app:
+                print(f'{app_name}: running', file=sys.stderr)
+                report['apps'][app_name] = run_load(
+                    app.port, token, scenarios(app_name, app.seeded),
+                    args.concurrency, args.warmup, args.duration, args.seed
+                )
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+    _print_results(report, previous)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures the per-request overhead of the metrics hooks (before_request, after_request
+and teardown_request), i.e. what every request pays for /metrics, alone and compared
+with dispatching a trivial request through Flask with and without them.
+
+Usage (from the repository root, with the requirements installed):
+    python benchmarks/metrics_bench.py [--app app4] [--requests 100000]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='app4', choices=['app1', 'app2', 'app3', 'app4'])
+    parser.add_argument('--requests', type=int, default=100000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(ROOT, args.app))
+    from flask import Flask, Response
+    from metrics import RequestMetrics
+
+    app = Flask(__name__)
+    app.add_url_rule('/shipment/<int:shipment_id>', 'shipment', lambda shipment_id: '')
+    metrics = RequestMetrics()
+    # Only the hooks are measured, not the periodic snapshot written to disk
+    metrics._next_dump = math.inf
+    response = Response()
+
+    with app.test_request_context('/shipment/1'):
+        app.preprocess_request()
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            metrics.before_request()
+            metrics.after_request(response)
+            metrics.teardown_request()
+        elapsed = time.perf_counter() - start
+
+    print(f'{"hooks":>14}: {elapsed / args.requests * 1e6:7.2f} us per request')
+
+    clients = {}
+    for mode in ('without hooks', 'with hooks'):
+        app = Flask(__name__)
+        app.add_url_rule('/shipment/<int:shipment_id>', 'shipment', lambda shipment_id: '')
+        if mode == 'with hooks':
+            app.before_request(metrics.before_request)
+            app.after_request(metrics.after_request)
+            app.teardown_request(metrics.teardown_request)
+        clients[mode] = app.test_client()
+    # Alternate the two modes and keep the best round of each, so that noise from
+    # the rest of the machine doesn't land on one side only
+    dispatch = {mode: math.inf for mode in clients}
+    for _ in range(5):
+        for mode, client in clients.items():
+            start = time.perf_counter()
+            for _ in range(args.requests // 50):
+                client.get('/shipment/1')
+            dispatch[mode] = min(dispatch[mode], (time.perf_counter() - start) / (args.requests // 50))
+    for mode, duration in dispatch.items():
+        print(f'{mode:>14}: {duration * 1e6:7.2f} us per request')
+    overhead = dispatch['with hooks'] / dispatch['without hooks'] - 1
+    print(f'{"overhead":>14}: {overhead * 100:6.1f} %')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Microbenchmark of PermissionMatrix.can.
+
+Usage (from the repository root, with the requirements installed):
+    python benchmarks/permissions_bench.py [--roles 50] [--resources 200]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app1'))
+
+from permissions import PermissionMatrix, READ, WRITE  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--roles', type=int, default=50)
+    parser.add_argument('--resources', type=int, default=200)
+    parser.add_argument('--checks', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    resources = [f'resource_{i}' for i in range(args.resources)]
+    matrix = PermissionMatrix()
+    matrix.load(
+        (role_id, resource, rng.random() < 0.5, rng.random() < 0.2)
+        for role_id in range(args.roles)
+        for resource in resources
+    )
+    checks = [
+        (rng.randrange(args.roles), rng.choice(resources), rng.choice((READ, WRITE)))
+        for _ in range(1024)
+    ]
+    can = matrix.can
+
+    def run():
+        for role_id, resource, mode in checks:
+            can(role_id, resource, mode)
+
+    loops = max(1, args.checks // len(checks))
+    best = min(timeit.repeat(run, number=loops, repeat=5))
+    per_check = best / (loops * len(checks))
+    print(f'{args.roles} roles x {args.resources} resources: {per_check * 1e9:.0f} ns per can()')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures the order pricing of app3 on a manifest: the vectorized price_orders
+against the same computation written as a loop over the items, and the whole
+/order/quote response (parsing, pricing and building the results).
+
+Usage (from the repository root, with the requirements installed):
+    python benchmarks/pricing_bench.py [--items 100000] [--items-per-order 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app3'))
+
+from constants import (  # noqa: E402
+    PRICING_BASE_FEE,
+    PRICING_RATE_PER_KG,
+    PRICING_VOLUMETRIC_DIVISOR
+)
+from functions import quote_orders  # noqa: E402
+from pricing import price_orders  # noqa: E402
+
+
+def _cents(amount):
+    return int(amount * 100 + 0.5 + 1e-9) / 100
+
+
+def price_orders_loop(orders):
+    # Reference implementation, one item at a time (without the validation)
+    totals = []
+    for _, items in orders:
+        total = PRICING_BASE_FEE
+        for item in items:
+            volumetric_weight = item['length'] * item['width'] * item['height'] / PRICING_VOLUMETRIC_DIVISOR
+            chargeable_weight = max(item['weight'], volumetric_weight) * item['quantity']
+            freight = _cents(chargeable_weight * PRICING_RATE_PER_KG)
+            total += _cents(item['price'] * item['quantity'] + freight)
+        totals.append(_cents(total))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--items-per-order', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    orders = []
+    for _ in range(max(args.items // args.items_per_order, 1)):
+        items = [
+            {
+                'weight': round(rng.uniform(0.1, 30), 2),
+                'length': rng.randint(5, 120),
+                'width': rng.randint(5, 80),
+                'height': rng.randint(2, 60),
+                'quantity': rng.randint(1, 5),
+                'price': round(rng.uniform(1, 500), 2)
+            }
+            for _ in range(args.items_per_order)
+        ]
+        orders.append((None, items))
+    records = [{'items': items} for _, items in orders]
+    item_count = sum(len(items) for _, items in orders)
+
+    if price_orders(orders).order_total.tolist() != price_orders_loop(orders):
+        sys.exit('price_orders() differs from the loop')
+
+    single = orders[:1]
+    for name, func, data, count in (
+        ('loop', price_orders_loop, orders, item_count),
+        ('vectorized', price_orders, orders, item_count),
+        ('quote', quote_orders, records, item_count),
+        ('one order', price_orders, single, len(single[0][1])),
+    ):
+        best = min(timeit.repeat(lambda: func(data), number=1, repeat=5))
+        print(f'{name:>10}: {best * 1e3:8.2f} ms for {count} items ({best / count * 1e6:.2f} us per item)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares flask_restx marshal with the compiled serializer on a list of shipments
+with their events (the shipment list endpoint of app4).
+
+Usage (from the repository root, with the requirements installed):
+    python benchmarks/serializer_bench.py [--rows 10000] [--events 3]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app4'))
+
+from flask_restx import marshal  # noqa: E402
+from models import Event, Shipment  # noqa: E402
+from schemas import shipment_schema  # noqa: E402
+from serializer import serialize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--events', type=int, default=3)
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(args.rows):
+        shipment = Shipment(
+            shipment_id=i,
+            tracking_number=f'TRK{i:010d}',
+            order_id=i,
+            shipping_type='express',
+            sender_name=f'Sender {i}',
+            sender_address='1 Sender Street',
+            receiver_name=f'Receiver {i}',
+            receiver_address='2 Receiver Road',
+            shipment_date=start + timedelta(minutes=i),
+            estimated_delivery_date=start + timedelta(days=3, minutes=i)
+        )
+        shipment.events = [
+            Event(event_id=i * args.events + j, shipment_id=i, shipment_status_id=j + 1,
+                  event_date=start + timedelta(hours=j, minutes=i), comment='scan')
+            for j in range(args.events)
+        ]
+        rows.append(shipment)
+
+    if serialize(rows, shipment_schema) != marshal(rows, shipment_schema):
+        sys.exit('serialize() output differs from marshal()')
+
+    for name, func in (('marshal', marshal), ('serialize', serialize)):
+        best = min(timeit.repeat(lambda: func(rows, shipment_schema), number=1, repeat=5))
+        print(f'{name:>9}: {best * 1e3:8.1f} ms for {args.rows} shipments ({best / args.rows * 1e6:.1f} us per row)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Gunicorn settings, read from the environment
+import gc
+import os
+import sys
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+chdir = '/app'
+
+# One worker per available core by default; threads (gthread) or greenlets (gevent)
+# provide concurrency inside each worker
+workers = int(os.environ.get('WEB_CONCURRENCY', _cpu_count()))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Import the app once in the master and share it with the workers (copy-on-write).
+# Off by default for gevent, which must patch the standard library before the app
+# is imported.
+preload_app = os.environ.get(
+    'GUNICORN_PRELOAD', 'false' if worker_class == 'gevent' else 'true'
+).lower() == 'true'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # Move everything imported so far out of the collector's reach, so that garbage
+    # collections in the workers don't write to (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    # With preload_app the workers inherit the master's engines (primary and
+    # replica). They must not reuse any pooled connection the master opened:
+    # close=False drops them without closing the master's sockets.
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        from __init__ import db
+        with wsgi.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
@@ -0,0 +1,131 @@
+"""
+Boots the apps on SQLite, the way benchmarks/load.py does, so that the tests run
+without PostgreSQL. The apps share their module names (models, routes, ...), so
+every test module declares its app in APP and gets it loaded afresh.
+
+Usage (from the repository root, with the local requirements installed):
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateSchema
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+APPS = ('app1', 'app2', 'app3', 'app4')
+SCHEMAS = ('Security', 'Client', 'order_schema', 'shipment_schema')
+
+DATABASE_DIR = tempfile.mkdtemp(prefix='xdel-tests-')
+
+
+# SQLite has no schemas: each one is a database file attached next to the main one
+@event.listens_for(Engine, 'connect')
+def attach_schemas(dbapi_connection, connection_record):
+    for schema in SCHEMAS:
+        dbapi_connection.execute(f'ATTACH DATABASE "{os.path.join(DATABASE_DIR, schema)}.db" AS "{schema}"')
+
+
+@compiles(CreateSchema, 'sqlite')
+def create_schema(element, compiler, **kw):
+    return 'SELECT 1'
+
+
+def load_app(app_name):
+    """
+    Imports an app from its directory, dropping the modules of the previously
+    loaded one, and creates its tables in an empty database.
+
+    Args:
+        app_name (str): The app directory, e.g. app4.
+
+    Returns:
+        tuple: The Flask app and its SQLAlchemy instance.
+    """
+    app_dirs = [os.path.join(ROOT, name) for name in APPS]
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) in app_dirs:
+            del sys.modules[name]
+    sys.path[:] = [path for path in sys.path if os.path.abspath(path) not in app_dirs]
+    sys.path.insert(0, os.path.join(ROOT, app_name))
+
+    for schema in SCHEMAS:
+        path = os.path.join(DATABASE_DIR, f'{schema}.db')
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ.update({
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': f'sqlite:///{os.path.join(DATABASE_DIR, app_name)}.db',
+        'SECRET_KEY': 'test-secret',
+        'JWT_SECRET_KEY': 'test-jwt-secret-test-jwt-secret-test',
+        'REFERENCE_CACHE_DIR': DATABASE_DIR,
+        'REPLICA_STATE_DIR': DATABASE_DIR,
+        'BCRYPT_LOG_ROUNDS': '4',
+        'METRICS_ENABLED': 'false'
+    })
+
+    from __init__ import create_app, db
+    from commands import init_db
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+    return app, db
+
+
+@pytest.fixture(scope='module')
+def app(request):
+    app, db = load_app(request.module.APP)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(scope='module')
+def db(app):
+    from __init__ import db
+    return db
+
+
+@pytest.fixture(scope='module')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def headers(app):
+    from flask_jwt_extended import create_access_token
+    token = create_access_token(identity='1', additional_claims={'uid': 1, 'role_id': 1})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def count_queries(db):
+    """
+    Counts the statements sent to the database inside a ``with`` block:
+
+        with count_queries() as queries:
+            client.get('/shipment/')
+        assert len(queries) == 2
+    """
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return counter
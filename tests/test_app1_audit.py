@@ -0,0 +1,41 @@
+"""
+Audit log writer: failed batches and access to its metrics.
+"""
+from datetime import datetime
+
+import pytest
+
+
+APP = 'app1'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def user(db):
+    from models import Role, User
+
+    db.session.add(Role(id=1, name='admin'))
+    db.session.add(User(id=1, username='alice', hashed_password='x', role_id=1))
+    db.session.commit()
+
+
+def test_rejected_row_keeps_the_rest_of_the_batch(db):
+    from audit import AuditLogger
+    from models import Log
+
+    audit_logger = AuditLogger(10, 10, 1)
+    now = datetime.now()
+    batch = [
+        {'user_id': 1, 'action': 'GET /users/ 200', 'timestamp': now},
+        {'user_id': None, 'action': 'GET /roles/ 200', 'timestamp': now},
+        {'user_id': 1, 'action': 'GET /logs/ 200', 'timestamp': now},
+    ]
+    audit_logger._flush(db.engine, batch)
+    assert (audit_logger.flushed, audit_logger.failed) == (2, 1)
+    assert [log.action for log in Log.query.order_by(Log.id)] == ['GET /users/ 200', 'GET /logs/ 200']
+
+
+def test_metrics_require_a_token(client, headers):
+    assert client.get('/audit/metrics').status_code == 401
+    response = client.get('/audit/metrics', headers=headers)
+    assert response.status_code == 200
+    assert response.json['failed'] == 0
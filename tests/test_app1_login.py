@@ -0,0 +1,49 @@
+"""
+Claims of the access tokens issued by app1.
+"""
+import pytest
+
+
+APP = 'app1'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def user(db):
+    from functions import hash_password
+    from models import AccessControl, Role, User
+
+    db.session.add(Role(id=1, name='admin'))
+    db.session.add(AccessControl(role_id=1, resource='users', read_permission=True, write_permission=True))
+    db.session.add(User(username='alice', hashed_password=hash_password('secret'), role_id=1))
+    db.session.commit()
+
+
+def test_login_claims(client, count_queries):
+    from flask_jwt_extended import decode_token
+
+    with count_queries() as statements:
+        response = client.post('/login/', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+    assert len(statements) == 1, statements
+    claims = decode_token(response.json['access_token'])
+    assert claims['sub'] == 'alice'
+    assert (claims['uid'], claims['role_id'], claims['role']) == (1, 1, 'admin')
+    assert 'perms' not in claims
+
+
+def test_pool_recovers_from_dead_worker(client):
+    import functions
+
+    pool = functions._pool
+    for process in list(pool._processes.values()):
+        process.kill()
+        process.join()
+
+    response = client.post('/login/', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 503
+    assert functions._pool is None
+
+    response = client.post('/login/', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+    assert functions._pool is not pool
+    assert functions._pool_slots._value == functions.BCRYPT_POOL_WORKERS + functions.BCRYPT_POOL_QUEUE_SIZE
@@ -0,0 +1,106 @@
+"""
+Permission matrix updates made by the app1 access control endpoints.
+"""
+import threading
+
+import pytest
+
+
+APP = 'app1'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def role(db):
+    from models import Role
+
+    db.session.add(Role(id=1, name='admin'))
+    db.session.commit()
+
+
+@pytest.fixture
+def matrix(db):
+    from permissions import load_permission_matrix, permission_matrix
+
+    load_permission_matrix()
+    return permission_matrix
+
+
+def create(client, headers, read_permission, write_permission):
+    response = client.post('/access_controls/', headers=headers, json={
+        'role_id': 1, 'resource': 'users', 'read_permission': read_permission, 'write_permission': write_permission
+    })
+    assert response.status_code == 200
+    return response.json['id']
+
+
+def test_duplicate_rows_are_combined(client, headers, matrix):
+    from permissions import READ, WRITE
+
+    first = create(client, headers, True, False)
+    second = create(client, headers, True, True)
+    assert matrix.can(1, 'users', READ) and matrix.can(1, 'users', WRITE)
+
+    # Deleting one row keeps what the other one grants
+    assert client.delete(f'/access_controls/{second}', headers=headers).status_code == 204
+    assert matrix.can(1, 'users', READ) and not matrix.can(1, 'users', WRITE)
+
+    # Moving the last row to another resource clears the old one
+    response = client.put(f'/access_controls/{first}', headers=headers, json={
+        'role_id': 1, 'resource': 'logs', 'read_permission': True, 'write_permission': False
+    })
+    assert response.status_code == 200
+    assert not matrix.can(1, 'users', READ) and matrix.can(1, 'logs', READ)
+
+
+def test_single_reload(app, matrix, monkeypatch):
+    import permissions
+
+    calls = []
+    loaded = threading.Event()
+
+    def slow_load():
+        calls.append(1)
+        loaded.wait(5)
+
+    monkeypatch.setattr(permissions, 'load_permission_matrix', slow_load)
+    monkeypatch.setattr(matrix, 'loaded_at', matrix.loaded_at - permissions.RBAC_REFRESH_INTERVAL - 1)
+    threads = [threading.Thread(target=permissions.refresh_permission_matrix) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    loaded.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_role_changes_apply_to_tokens(app, client, headers, db, matrix, monkeypatch, count_queries):
+    import permissions
+    from models import Role, User
+    from flask_jwt_extended import create_access_token
+    from werkzeug.exceptions import Forbidden
+
+    db.session.add(Role(id=2, name='guest'))
+    db.session.add(User(id=7, username='moved', hashed_password='x', role_id=1))
+    db.session.commit()
+    create(client, headers, True, False)
+    token = create_access_token(identity='moved', additional_claims={'uid': 7, 'role_id': 1})
+    monkeypatch.setattr(permissions, 'RBAC_ENABLED', True)
+    view = permissions.permission_required('users')(lambda: 'ok')
+
+    def check():
+        with app.test_request_context('/', headers={'Authorization': f'Bearer {token}'}):
+            return view()
+
+    assert check() == 'ok'
+    with count_queries() as statements:
+        assert check() == 'ok'
+    assert statements == []
+
+    # Moved to a role without access: the role_id claim of the token is not trusted
+    response = client.put('/users/7', headers=headers, json={'username': 'moved', 'password': 'x', 'role_id': 2})
+    assert response.status_code == 200
+    with pytest.raises(Forbidden):
+        check()
+
+    assert client.delete('/users/7', headers=headers).status_code == 204
+    assert permissions.role_cache.role_id(7) is None
@@ -0,0 +1,51 @@
+"""
+Query counts of the app1 endpoints that serialize users with their role and its
+access controls: constant whatever the number of rows in the response.
+"""
+import pytest
+
+
+APP = 'app1'
+ROLES = 4
+USERS = 20
+RESOURCES = ('users', 'roles', 'logs')
+
+
+@pytest.fixture(scope='module', autouse=True)
+def users(db):
+    from models import AccessControl, Role, User
+
+    db.session.execute(db.insert(Role), [{'name': f'role{i}'} for i in range(1, ROLES + 1)])
+    db.session.execute(db.insert(AccessControl), [
+        {'role_id': role_id, 'resource': resource, 'read_permission': True, 'write_permission': False}
+        for role_id in range(1, ROLES + 1) for resource in RESOURCES
+    ])
+    db.session.execute(db.insert(User), [
+        {'username': f'user{i}', 'hashed_password': 'x', 'role_id': 1 + i % ROLES}
+        for i in range(USERS)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path, queries', [
+    ('/users/?limit=2', 2),
+    (f'/users/?limit={USERS}', 2),
+    ('/users/1', 2),
+])
+def test_user_query_count(client, headers, count_queries, path, queries):
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == queries, statements
+
+
+@pytest.mark.parametrize('path', ['/roles/', '/roles/1'])
+def test_role_query_count(client, headers, count_queries, path):
+    from schemas import role_reference
+
+    # Roles are served from the reference data cache: count the reload
+    role_reference.bump()
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 2, statements
@@ -0,0 +1,11 @@
+"""
+Connection pool statistics endpoint.
+"""
+APP = 'app2'
+
+
+def test_pool_stats_require_a_token(client, headers):
+    assert client.get('/db/pool').status_code == 401
+    response = client.get('/db/pool', headers=headers)
+    assert response.status_code == 200
+    assert response.json['size'] >= 1
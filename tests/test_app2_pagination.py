@@ -0,0 +1,36 @@
+"""
+Cursors of the paginated app2 endpoints.
+"""
+import pytest
+
+
+APP = 'app2'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def customers(db):
+    from models import Customer
+
+    db.session.execute(db.insert(Customer), [{'name': f'Customer {i}'} for i in range(1, 6)])
+    db.session.commit()
+
+
+def test_next_page(client, headers):
+    response = client.get('/customer/?limit=2', headers=headers)
+    assert response.status_code == 200
+    response = client.get(f"/customer/?limit=2&cursor={response.headers['X-Next-Cursor']}", headers=headers)
+    assert response.status_code == 200
+    assert [customer['customer_id'] for customer in response.json] == [3, 4]
+
+
+@pytest.mark.parametrize('value', [True, [1, 2], {'a': 1}, 'abc', 1.5, None])
+def test_invalid_cursor(client, headers, value):
+    from pagination import encode_cursor
+
+    response = client.get(f'/customer/?cursor={encode_cursor(value)}', headers=headers)
+    assert response.status_code == 400
+
+
+def test_malformed_cursor(client, headers):
+    response = client.get('/customer/?cursor=***', headers=headers)
+    assert response.status_code == 400
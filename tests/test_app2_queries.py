@@ -0,0 +1,40 @@
+"""
+Query counts of the app2 endpoints that serialize customers with their addresses
+and addresses with their customer: constant whatever the number of rows in the
+response.
+"""
+import pytest
+
+
+APP = 'app2'
+CUSTOMERS = 20
+
+
+@pytest.fixture(scope='module', autouse=True)
+def customers(db):
+    from models import Address, Customer
+
+    db.session.execute(db.insert(Customer), [
+        {'type': 'individual', 'name': f'Customer {i}', 'email': f'customer{i}@example.com'}
+        for i in range(CUSTOMERS)
+    ])
+    db.session.execute(db.insert(Address), [
+        {'customer_id': customer_id, 'address': f'{n} Orchard Road', 'city': 'Singapore'}
+        for customer_id in range(1, CUSTOMERS + 1) for n in (1, 2)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path, queries', [
+    ('/customer/?limit=2', 2),
+    (f'/customer/?limit={CUSTOMERS}', 2),
+    ('/customer/1', 2),
+    ('/address/?limit=2', 1),
+    (f'/address/?limit={CUSTOMERS}', 1),
+    ('/address/1', 1),
+])
+def test_customer_query_count(client, headers, count_queries, path, queries):
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == queries, statements
@@ -0,0 +1,40 @@
+"""
+Record limit of the app3 bulk endpoints.
+"""
+import json
+
+import pytest
+
+
+APP = 'app3'
+LIMIT = 3
+
+
+@pytest.fixture(autouse=True)
+def limit(monkeypatch):
+    import functions
+    monkeypatch.setattr(functions, 'BULK_MAX_RECORDS', LIMIT)
+
+
+def ndjson(count):
+    return '\n'.join(json.dumps({'items': [{'weight': 1, 'quantity': 1, 'price': 1}]}) for _ in range(count))
+
+
+@pytest.mark.parametrize('path, status', [('/order/bulk', 201), ('/order/quote', 200)])
+def test_ndjson_within_limit(client, headers, path, status):
+    response = client.post(path, data=ndjson(LIMIT), content_type='application/x-ndjson', headers=headers)
+    assert response.status_code == status
+    assert len(response.json['results']) == LIMIT
+
+
+@pytest.mark.parametrize('path', ['/order/bulk', '/order/quote'])
+def test_ndjson_over_limit(client, headers, path):
+    response = client.post(path, data=ndjson(LIMIT + 1), content_type='application/x-ndjson', headers=headers)
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize('path', ['/order/bulk', '/order/quote'])
+def test_json_over_limit(client, headers, path):
+    records = json.loads(f'[{ndjson(LIMIT + 1).replace(chr(10), ",")}]')
+    response = client.post(path, json=records, headers=headers)
+    assert response.status_code == 413
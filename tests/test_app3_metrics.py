@@ -0,0 +1,84 @@
+"""
+Metrics of the workers that exited and access to /metrics.
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+from flask import Flask
+
+
+APP = 'app3'
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def snapshot(count, in_flight):
+    return {
+        'requests': [['/order/', 'GET', [count] + [0] * 11 + [0.5 * count, 0.1 * count, 2 * count]]],
+        'responses': [['/order/', 'GET', 200, count]],
+        'in_flight': in_flight,
+        'pool': {'size': 5, 'checkouts': count},
+        'audit': {'flushed': count, 'queued': 1}
+    }
+
+
+@pytest.fixture
+def request_metrics(app, tmp_path):
+    from metrics import RequestMetrics
+
+    request_metrics = RequestMetrics()
+    request_metrics._directory = str(tmp_path)
+    return request_metrics
+
+
+def test_dead_workers_are_folded(request_metrics, tmp_path):
+    from metrics import DEAD_SNAPSHOT
+
+    for count in (3, 4):
+        (tmp_path / f'{dead_pid()}.json').write_text(json.dumps(snapshot(count, in_flight=2)))
+        requests, responses, totals = request_metrics._collect()
+    # A later scrape finds the same totals in the dead aggregate
+    assert request_metrics._collect() == (requests, responses, totals)
+    assert [path.name for path in tmp_path.glob('*.json')] == [DEAD_SNAPSHOT]
+    assert requests[('/order/', 'GET')][0] == 7
+    assert responses[('/order/', 'GET', 200)] == 7
+    assert totals == {'in_flight': 0, 'pool': {'checkouts': 7}, 'audit': {'flushed': 7}}
+
+
+def test_live_workers_keep_their_gauges(request_metrics, tmp_path):
+    import os
+
+    (tmp_path / f'{os.getpid()}.json').write_text(json.dumps(snapshot(2, in_flight=1)))
+    (tmp_path / f'{dead_pid()}.json').write_text(json.dumps(snapshot(3, in_flight=2)))
+    _, responses, totals = request_metrics._collect()
+    assert responses[('/order/', 'GET', 200)] == 5
+    assert totals == {'in_flight': 1, 'pool': {'size': 5, 'checkouts': 5}, 'audit': {'flushed': 5, 'queued': 1}}
+
+
+@pytest.mark.parametrize('metrics_token', ['', 'scrape-secret'])
+def test_metrics_require_a_token(request_metrics, monkeypatch, tmp_path, metrics_token):
+    import metrics
+    from __init__ import jwt
+
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', metrics_token)
+    monkeypatch.setattr(request_metrics, '_endpoint', lambda: 'metrics')
+    monkeypatch.setattr(request_metrics, '_dump_at_exit', lambda: None)
+    monkeypatch.setattr(request_metrics, 'dump', lambda: None)
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-test-jwt-secret-test'
+    jwt.init_app(app)
+    request_metrics.init_app(app)
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code in (401, 422)
+    if metrics_token:
+        response = client.get('/metrics', headers={'Authorization': f'Bearer {metrics_token}'})
+        assert response.status_code == 200
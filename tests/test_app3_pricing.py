@@ -0,0 +1,57 @@
+"""
+Validation of the item values priced by /order/create and /order/quote.
+"""
+import pytest
+
+
+APP = 'app3'
+
+ITEM = {'weight': 2, 'length': 10, 'width': 10, 'height': 10, 'quantity': 1, 'price': 5}
+
+
+@pytest.mark.parametrize('field, value', [
+    ('weight', 10 ** 400),
+    ('price', -10 ** 400),
+    ('weight', True),
+    ('quantity', False),
+    ('length', 'ten'),
+    ('quantity', 1e20),
+    ('quantity', 2.5),
+])
+def test_invalid_item_value(client, headers, field, value):
+    item = {**ITEM, field: value}
+
+    response = client.post('/order/create', json={'items': [item]}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.post('/order/quote', json=[{'items': [ITEM]}, {'items': [ITEM, item]}], headers=headers)
+    assert response.status_code == 207
+    results = response.json['results']
+    assert [result['status'] for result in results] == ['quoted', 'error']
+
+
+def test_amount_overflow(client, headers):
+    item = {'weight': 1e300, 'length': 1e300, 'width': 1e300, 'height': 1e300, 'quantity': 1, 'price': 1e300}
+
+    response = client.post('/order/create', json={'items': [item]}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.post('/order/quote', json=[{'items': [item]}], headers=headers)
+    assert response.status_code == 207
+    assert b'Infinity' not in response.data
+    assert response.json['results'][0]['status'] == 'error'
+
+
+def test_quoted_amounts(client, headers):
+    item = {'weight': 2, 'length': 10, 'width': 10, 'height': 10, 'quantity': 3, 'price': 5}
+
+    response = client.post('/order/quote', json=[{'items': [item]}], headers=headers)
+    assert response.status_code == 200
+    (result,) = response.json['results']
+    assert result['total_amount'] == 29.0
+    assert result['chargeable_weight'] == 6.0
+    assert result['items'] == [{'volumetric_weight': 0.2, 'chargeable_weight': 6.0, 'freight': 9.0, 'line_total': 24.0}]
+
+    response = client.post('/order/create', json={'items': [item]}, headers=headers)
+    assert response.status_code == 201
+    assert float(response.json['total_amount']) == 29.0
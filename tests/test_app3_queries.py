@@ -0,0 +1,49 @@
+"""
+Query counts of the app3 endpoints that serialize orders with their items:
+constant whatever the number of rows in the response.
+"""
+from datetime import datetime
+
+import pytest
+
+
+APP = 'app3'
+ORDERS = 20
+
+
+@pytest.fixture(scope='module', autouse=True)
+def orders(db):
+    from models import Order, OrderItem, ShipmentType
+
+    db.session.execute(db.insert(ShipmentType), [{'shipment_type_id': 1, 'shipment_type_name': 'Standard'}])
+    db.session.execute(db.insert(Order), [
+        {'sender_name': f'Sender {i}', 'order_date': datetime.now(), 'total_amount': 10, 'shipment_type_id': 1}
+        for i in range(ORDERS)
+    ])
+    db.session.execute(db.insert(OrderItem), [
+        {'order_id': order_id, 'weight': 1, 'length': 10, 'width': 10, 'height': 10, 'quantity': n, 'price': 5}
+        for order_id in range(1, ORDERS + 1) for n in (1, 2)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path, queries', [
+    ('/order/?limit=2', 2),
+    (f'/order/?limit={ORDERS}', 2),
+    ('/order/1', 2),
+    ('/order/search/Sender?limit=2', 2),
+    (f'/order/search/Sender?limit={ORDERS}', 2),
+])
+def test_order_query_count(client, headers, count_queries, path, queries):
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == queries, statements
+
+
+@pytest.mark.parametrize('value', [True, -1, 1.5, 'abc'])
+def test_invalid_search_cursor(client, headers, value):
+    from pagination import encode_cursor
+
+    response = client.get(f'/order/search/Sender?cursor={encode_cursor(value)}', headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,114 @@
+"""
+Batch scan uploads of app4: event dates, status updates and database errors.
+"""
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+
+APP = 'app4'
+
+
+@pytest.fixture(autouse=True)
+def shipment(db):
+    from models import Event, Shipment, ShipmentStatus
+
+    db.session.execute(db.delete(Event))
+    db.session.execute(db.delete(Shipment))
+    db.session.execute(db.delete(ShipmentStatus))
+    db.session.execute(db.insert(ShipmentStatus), [
+        {'shipment_status_id': i, 'shipment_status_name': name}
+        for i, name in enumerate(('Created', 'Picked up', 'In transit', 'Delivered'), 1)
+    ])
+    db.session.execute(db.insert(Shipment), [{'shipment_id': 1, 'tracking_number': 'XD1', 'shipment_status_id': 1}])
+    db.session.commit()
+    from schemas import shipment_status_reference
+    shipment_status_reference.bump()
+
+
+def status_of(db, shipment_id):
+    from models import Shipment
+    return db.session.execute(
+        db.select(Shipment.shipment_status_id).where(Shipment.shipment_id == shipment_id)
+    ).scalar()
+
+
+def test_mixed_time_zones(client, headers, db):
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': '2026-01-01T10:00:00Z'},
+        {'shipment_id': 1, 'shipment_status_id': 3, 'event_date': '2026-01-02T10:00:00'},
+    ])
+    assert response.status_code == 201, response.json
+    assert status_of(db, 1) == 3
+
+
+def test_late_scan_keeps_newer_status(client, headers, db):
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 4, 'event_date': '2026-01-03T10:00:00'},
+    ])
+    assert response.status_code == 201
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': '2026-01-01T10:00:00'},
+    ])
+    assert response.status_code == 201
+    assert status_of(db, 1) == 4
+
+
+def test_failed_chunk_is_reported(client, headers, db, monkeypatch):
+    import functions
+
+    apply_latest_status = functions.apply_latest_status
+
+    def failing_second_chunk(rows):
+        if any(row['shipment_status_id'] == 3 for row in rows):
+            raise DBAPIError('UPDATE', {}, Exception('chunk rejected'))
+        apply_latest_status(rows)
+
+    monkeypatch.setattr(functions, 'BULK_CHUNK_SIZE', 1)
+    monkeypatch.setattr(functions, 'apply_latest_status', failing_second_chunk)
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': '2026-01-01T10:00:00'},
+        {'shipment_id': 1, 'shipment_status_id': 3, 'event_date': '2026-01-02T10:00:00'},
+    ])
+    assert response.status_code == 207
+    assert [result['status'] for result in response.json['results']] == ['created', 'error']
+    assert response.json['results'][1]['error'] == 'chunk rejected'
+    assert status_of(db, 1) == 2
+    assert db.session.execute(db.select(db.func.count()).select_from(functions.Event)).scalar() == 1
+
+
+def test_rejected_scan_only_fails_itself(client, headers, db, monkeypatch):
+    import functions
+
+    apply_latest_status = functions.apply_latest_status
+
+    def failing_scan(rows):
+        if any(row['comment'] == 'rejected' for row in rows):
+            raise DBAPIError('UPDATE', {}, Exception('scan rejected'))
+        apply_latest_status(rows)
+
+    monkeypatch.setattr(functions, 'apply_latest_status', failing_scan)
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': '2026-01-01T10:00:00'},
+        {'shipment_id': 1, 'shipment_status_id': 3, 'event_date': '2026-01-02T10:00:00', 'comment': 'rejected'},
+        {'shipment_id': 1, 'shipment_status_id': 4, 'event_date': '2026-01-03T10:00:00'},
+    ])
+    assert response.status_code == 207
+    assert [result['status'] for result in response.json['results']] == ['created', 'error', 'created']
+    assert status_of(db, 1) == 4
+
+
+@pytest.mark.parametrize('scan, error', [
+    ({'shipment_id': True, 'shipment_status_id': 2}, "shipment_id and shipment_status_id must be integers"),
+    ({'shipment_id': 1, 'shipment_status_id': True}, "shipment_id and shipment_status_id must be integers"),
+    ({'shipment_id': 1, 'shipment_status_id': 2, 'comment': {}}, "comment must be a string"),
+    ({'shipment_id': 1, 'shipment_status_id': 2, 'event_date': 20260101}, "event_date must be an ISO 8601 string"),
+])
+def test_invalid_scan(client, headers, db, scan, error):
+    response = client.post('/event/batch', headers=headers, json=[
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': '2026-01-01T10:00:00'},
+        scan,
+    ])
+    assert response.status_code == 207
+    assert response.json['results'][0]['status'] == 'created'
+    assert response.json['results'][1]['status'] == 'error'
+    assert response.json['results'][1]['error'] == error
@@ -0,0 +1,43 @@
+"""
+Query counts of the app4 endpoints that serialize shipments with their events:
+constant whatever the number of rows in the response.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+APP = 'app4'
+SHIPMENTS = 20
+
+
+@pytest.fixture(scope='module', autouse=True)
+def shipments(db):
+    from models import Event, Shipment, ShipmentStatus
+
+    now = datetime.now()
+    db.session.execute(db.insert(ShipmentStatus), [{'shipment_status_name': name} for name in ('Created', 'In transit')])
+    db.session.execute(db.insert(Shipment), [
+        {'tracking_number': f'XD{i:08d}', 'order_id': i, 'shipment_status_id': 2, 'shipment_date': now}
+        for i in range(1, SHIPMENTS + 1)
+    ])
+    db.session.execute(db.insert(Event), [
+        {'shipment_id': shipment_id, 'shipment_status_id': status_id, 'event_date': now + timedelta(minutes=status_id)}
+        for shipment_id in range(1, SHIPMENTS + 1) for status_id in (1, 2)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path, queries', [
+    ('/shipment/?limit=2', 2),
+    (f'/shipment/?limit={SHIPMENTS}', 2),
+    ('/shipment/search/XD0?limit=2', 2),
+    (f'/shipment/search/XD0?limit={SHIPMENTS}', 2),
+    ('/shipment/1', 2),
+    ('/shipment/XD00000001', 2),
+])
+def test_shipment_query_count(client, headers, count_queries, path, queries):
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == queries, statements
@@ -0,0 +1,64 @@
+"""
+Read-your-writes routing: after a write, the reads of the same identity go to the
+primary, in every worker.
+"""
+import multiprocessing
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+
+APP = 'app4'
+
+
+@pytest.fixture
+def recent_writers(app, tmp_path):
+    from routing import recent_writers
+
+    recent_writers.configure(f'sqlite:///{tmp_path}/primary.db')
+    return recent_writers
+
+
+def use_replica_as(app, identity, method='GET'):
+    from routing import use_replica
+
+    token = create_access_token(identity=identity)
+    with app.test_request_context('/shipment/', method=method, headers={'Authorization': f'Bearer {token}'}):
+        verify_jwt_in_request()
+        return use_replica()
+
+
+def test_writer_reads_from_primary(app, recent_writers):
+    assert use_replica_as(app, 'alice')
+    recent_writers.remember('alice', time.time() + 5)
+    assert not use_replica_as(app, 'alice')
+    assert use_replica_as(app, 'bob')
+    assert not use_replica_as(app, 'bob', method='POST')
+
+
+def test_deadline_expires(app, recent_writers):
+    recent_writers.remember('carol', time.time() - 1)
+    assert use_replica_as(app, 'carol')
+
+
+def test_shared_between_workers(app, recent_writers):
+    recent_writers.until('dave')
+    worker = multiprocessing.get_context('fork').Process(
+        target=recent_writers.remember, args=('dave', time.time() + 5)
+    )
+    worker.start()
+    worker.join()
+    assert not use_replica_as(app, 'dave')
+
+
+def test_successful_write_is_remembered(app, recent_writers):
+    from routing import remember_write
+
+    for identity, status in (('erin', 201), ('frank', 400)):
+        token = create_access_token(identity=identity)
+        with app.test_request_context('/shipment/', method='POST', headers={'Authorization': f'Bearer {token}'}):
+            verify_jwt_in_request()
+            remember_write(app.response_class(status=status))
+    assert not use_replica_as(app, 'erin')
+    assert use_replica_as(app, 'frank')
@@ -0,0 +1,37 @@
+"""
+Tracking number normalization of app4 shipments.
+"""
+import pytest
+
+
+APP = 'app4'
+
+
+@pytest.fixture(autouse=True)
+def empty(db):
+    from models import Event, Shipment
+
+    db.session.execute(db.delete(Event))
+    db.session.execute(db.delete(Shipment))
+    db.session.commit()
+
+
+def test_blank_tracking_numbers(client, headers):
+    for _ in range(2):
+        response = client.post('/shipment/', json={'tracking_number': '  ', 'order_id': 1}, headers=headers)
+        assert response.status_code == 201
+        assert response.json['tracking_number'] is None
+
+    for path in ('/shipment/%20', '/shipment/%20/timeline'):
+        assert client.get(path, headers=headers).status_code == 404
+    assert client.get('/shipment/search/%20', headers=headers).status_code == 400
+
+
+def test_duplicate_tracking_number(client, headers):
+    response = client.post('/shipment/', json={'tracking_number': 'xd 123'}, headers=headers)
+    assert response.status_code == 201
+    assert response.json['tracking_number'] == 'XD123'
+
+    response = client.post('/shipment/', json={'tracking_number': ' XD123 '}, headers=headers)
+    assert response.status_code == 400
+    assert client.get('/shipment/xd123', headers=headers).json['tracking_number'] == 'XD123'
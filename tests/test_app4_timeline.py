@@ -0,0 +1,92 @@
+"""
+Shipment timeline of app4: one statement per request, events oldest first with
+their status names, full and compact formats.
+"""
+from datetime import datetime
+
+import pytest
+
+
+APP = 'app4'
+SHIPMENT_DATE = datetime(2026, 1, 1, 9, 0)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def shipment(db):
+    from models import Event, Shipment, ShipmentStatus
+    from schemas import shipment_status_reference
+
+    db.session.execute(db.insert(ShipmentStatus), [
+        {'shipment_status_id': i, 'shipment_status_name': name}
+        for i, name in enumerate(('Created', 'Picked up', 'In transit'), 1)
+    ])
+    db.session.execute(db.insert(Shipment), [
+        {'shipment_id': 1, 'tracking_number': 'XD1', 'shipment_status_id': 3, 'shipment_date': SHIPMENT_DATE},
+        {'shipment_id': 2, 'tracking_number': 'XD2', 'shipment_status_id': 1, 'shipment_date': SHIPMENT_DATE},
+    ])
+    # Inserted out of order: the timeline sorts them by date
+    db.session.execute(db.insert(Event), [
+        {'shipment_id': 1, 'shipment_status_id': 3, 'event_date': datetime(2026, 1, 3, 8, 0), 'comment': 'Hub'},
+        {'shipment_id': 1, 'shipment_status_id': 1, 'event_date': datetime(2026, 1, 1, 9, 0), 'comment': None},
+        {'shipment_id': 1, 'shipment_status_id': 2, 'event_date': datetime(2026, 1, 2, 10, 0), 'comment': 'Driver'},
+    ])
+    db.session.commit()
+    shipment_status_reference.bump()
+
+
+@pytest.fixture(autouse=True)
+def statuses(app):
+    # Loads the status snapshot outside of the counted statements
+    from schemas import shipment_status_reference
+    shipment_status_reference.get(1)
+
+
+@pytest.mark.parametrize('path', ['/shipment/xd1/timeline', '/shipment/XD1/timeline?format=compact'])
+def test_single_statement(client, headers, count_queries, path):
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 1, statements
+
+
+def test_full_timeline(client, headers):
+    response = client.get('/shipment/XD1/timeline', headers=headers)
+    assert response.status_code == 200
+    timeline = response.json
+    assert (timeline['tracking_number'], timeline['shipment_status_name']) == ('XD1', 'In transit')
+    assert [
+        (event['shipment_status_name'], event['comment']) for event in timeline['events']
+    ] == [('Created', None), ('Picked up', 'Driver'), ('In transit', 'Hub')]
+    dates = [event['event_date'] for event in timeline['events']]
+    assert dates == sorted(dates)
+
+
+def test_compact_timeline(client, headers):
+    response = client.get('/shipment/XD1/timeline?format=compact', headers=headers)
+    assert response.status_code == 200
+    assert response.json == {
+        'tracking_number': 'XD1',
+        'status': 'In transit',
+        'shipment_date': int(SHIPMENT_DATE.timestamp()),
+        'estimated_delivery_date': None,
+        'actual_delivery_date': None,
+        'events': [
+            [int(datetime(2026, 1, 1, 9, 0).timestamp()), 'Created', None],
+            [int(datetime(2026, 1, 2, 10, 0).timestamp()), 'Picked up', 'Driver'],
+            [int(datetime(2026, 1, 3, 8, 0).timestamp()), 'In transit', 'Hub'],
+        ]
+    }
+
+
+def test_shipment_without_events(client, headers):
+    response = client.get('/shipment/XD2/timeline', headers=headers)
+    assert response.status_code == 200
+    assert response.json['events'] == []
+
+
+def test_unknown_tracking_number(client, headers):
+    assert client.get('/shipment/XD404/timeline', headers=headers).status_code == 404
+
+
+def test_unknown_format(client, headers):
+    assert client.get('/shipment/XD1/timeline?format=xml', headers=headers).status_code == 400